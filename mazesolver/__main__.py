@@ -1,14 +1,80 @@
-from mazesolver.controller import ApplicationController
-from mazesolver.gui import ApplicationGui
-from mazesolver.solver import Solver
-from mazesolver.pubsub import PUBLISHER, ProcessSubscriber
-from mazesolver.image import MazeImage
+import sys
 
-if __name__ == "__main__":
+from mazesolver.config import (
+    PRELOAD_MODULES,
+    PUMP_PROBE_INTERVAL,
+    PUMP_REPORT_INTERVAL,
+)
+from mazesolver.pubsub import (
+    PUBLISHER,
+    ProcessSubscriber,
+    Subscriber,
+    ThreadSubscriber,
+    prepare_processes,
+)
+from mazesolver.timer import StartupReport
+
+
+def monitor_pump() -> None:
+    from mazesolver.monitor import LatencyProbe, PumpMonitor
+
+    monitor = PumpMonitor(PUBLISHER, PUMP_REPORT_INTERVAL)
+    PUBLISHER.register_subscriber(Subscriber("PumpProbe", function=monitor.record))
+    probe = LatencyProbe(PUMP_PROBE_INTERVAL)
+    PUBLISHER.register_subscriber(ProcessSubscriber("PumpProbe", worker=probe))
+    monitor.start()
+
+
+def run_gui(report_timings: bool = False, report_pump: bool = False) -> None:
+    report = StartupReport()
+    # the forkserver imports the solver modules while the GUI is built
+    prepare_processes(PRELOAD_MODULES)
+    report.measure("forkserver")
+    from mazesolver.controller import ApplicationController
+    from mazesolver.export import AnimationExporter
+    from mazesolver.gui import ApplicationGui
+    from mazesolver.image import MazeImage
+    from mazesolver.loader import ImageLoader
+    from mazesolver.solver import SolverPool
+
+    report.measure("imports")
     image = MazeImage()
     controller = ApplicationController(image)
     gui = ApplicationGui(image)
-    solver = Solver()
-    subscriber = ProcessSubscriber("Maze", worker=solver)
-    PUBLISHER.register_subscriber(subscriber)
+    report.measure("window")
+    solver_pool = SolverPool("Maze")
+    PUBLISHER.register_subscriber(solver_pool)
+    report.measure("solvers started")
+    loader = ImageLoader()
+    PUBLISHER.register_subscriber(ThreadSubscriber("ImageLoader", worker=loader))
+    exporter = AnimationExporter()
+    PUBLISHER.register_subscriber(ThreadSubscriber("Exporter", worker=exporter))
+    waiting = {subscriber.worker.name for subscriber in solver_pool.subscribers}
+
+    def solver_ready(name: str) -> None:
+        waiting.discard(name)
+        if not waiting:
+            report.measure("solvers ready")
+            if report_timings:
+                print(report.format(), file=sys.stderr)
+
+    PUBLISHER.register_subscriber(Subscriber("SolverReady", function=solver_ready))
+    if report_pump:
+        monitor_pump()
     gui.start()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        from mazesolver.server import main
+
+        main(sys.argv[2:])
+    elif sys.argv[1:2] == ["parallel"]:
+        from mazesolver.parallel import main
+
+        main(sys.argv[2:])
+    else:
+        run_gui(
+            report_timings="--timings" in sys.argv[1:],
+            report_pump="--pump-stats" in sys.argv[1:],
+        )
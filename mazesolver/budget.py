@@ -0,0 +1,126 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Any, MutableSequence, Union
+
+import numpy as np
+
+from mazesolver.config import SPILL_DIRECTORY
+
+# from the least to the most compact, each slower than the one before
+STORAGES = ["memory", "compact", "disk"]
+
+# sizes of the objects the searches keep, as allocated by this interpreter
+POINTER = struct.calcsize("P")
+INT_SIZE = sys.getsizeof(1 << 20)
+LIST_SIZE = sys.getsizeof([])
+POINT_SIZE = sys.getsizeof((0, 0)) + 2 * INT_SIZE
+QUEUED_INT = POINTER + INT_SIZE
+HEAP_ENTRY = sys.getsizeof((0, 0, 0)) + 3 * INT_SIZE + POINTER
+
+# a list, an array or a memory mapped view, indexed the same way
+Grid = Union[MutableSequence[int], memoryview]
+
+
+def index_type(limit: int) -> str:
+    return "i" if limit < 2**31 else "q"
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, projected: int) -> None:
+        super().__init__(f"Projected {projected} bytes")
+        self.projected = projected
+
+
+class MemoryBudget:
+    # too few visited pixels to extrapolate from
+    WARMUP = 4096
+
+    def __init__(self, limit: int = 0) -> None:
+        self.limit = limit
+        self.storage = 0
+        self.fixed = 0
+        self.grids = 0
+        self.frontier = 0
+        self.spilled = 0
+        self.peak = 0
+
+    @property
+    def storage_name(self) -> str:
+        return STORAGES[self.storage]
+
+    @property
+    def can_degrade(self) -> bool:
+        return bool(self.limit) and self.storage < len(STORAGES) - 1
+
+    @property
+    def used(self) -> int:
+        return self.fixed + self.grids + self.frontier
+
+    def reset(self, fixed: int) -> None:
+        self.fixed = fixed
+        self.grids = self.frontier = self.spilled = 0
+        self.peak = max(self.peak, fixed)
+
+    def degrade(self) -> None:
+        self.storage += 1
+
+    def boxed(self, count: int) -> int:
+        # values stored in a list are objects of their own
+        return count * INT_SIZE if self.storage_name == "memory" else 0
+
+    def projected(self, visits: "array[int]", reachable: int) -> int:
+        # the grids are allocated up front, the frontier and the visits grow
+        # with the visited pixels
+        growing = self.frontier + len(visits) * visits.itemsize
+        self.peak = max(self.peak, self.fixed + self.grids + growing)
+        if len(visits) < self.WARMUP:
+            return self.fixed + self.grids + growing
+        return self.fixed + self.grids + growing * reachable // len(visits)
+
+    def exceeded(self, visits: "array[int]", reachable: int) -> bool:
+        projected = self.projected(visits, reachable)
+        return self.can_degrade and projected > self.limit
+
+    def _charge(self, nbytes: int) -> None:
+        if self.can_degrade and self.used + nbytes > self.limit:
+            raise BudgetExceeded(self.used + nbytes)
+        self.grids += nbytes
+        self.peak = max(self.peak, self.used)
+
+    def _map(self, size: int, typecode: str) -> memoryview:
+        nbytes = size * array(typecode).itemsize
+        self.spilled += nbytes
+        os.makedirs(SPILL_DIRECTORY, exist_ok=True)
+        # the mapping outlives the file, which is never seen on disk, and its
+        # pages are written back instead of swapped when memory runs short
+        with tempfile.TemporaryFile(dir=SPILL_DIRECTORY) as file:
+            file.truncate(max(nbytes, 1))
+            mapping = mmap.mmap(file.fileno(), max(nbytes, 1))
+        return np.frombuffer(mapping, dtype=typecode, count=size).data
+
+    def full(self, size: int, value: Any, typecode: str) -> Grid:
+        if self.storage_name == "memory":
+            self._charge(LIST_SIZE + POINTER * size)
+            return [value] * size
+        if self.storage_name == "compact":
+            self._charge(size * array(typecode).itemsize)
+            return array(typecode, [value]) * size
+        grid = self._map(size, typecode)
+        if value:
+            np.frombuffer(grid, dtype=typecode)[:] = value
+        return grid
+
+    def copy(self, values: np.ndarray, typecode: str) -> Grid:
+        if self.storage_name == "memory":
+            self._charge(LIST_SIZE + POINTER * values.size)
+            return values.ravel().tolist()
+        if self.storage_name == "compact":
+            self._charge(values.size * array(typecode).itemsize)
+            return array(typecode, values.astype(typecode).tobytes())
+        grid = self._map(values.size, typecode)
+        np.frombuffer(grid, dtype=typecode)[:] = values.ravel()
+        return grid
@@ -0,0 +1,107 @@
+import base64
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from mazesolver.types import Point
+
+# direction codes, as (row, column) steps: right, down, left, up
+STEPS = np.array([(0, 1), (1, 0), (0, -1), (-1, 0)], dtype=np.int64)
+MAX_RUN = 64
+
+
+class ChainCode(NamedTuple):
+    start: Point
+    length: int
+    data: bytes
+    compressed: bool = False
+
+    def codes(self) -> np.ndarray:
+        buffer = np.frombuffer(self.data, dtype=np.uint8)
+        if self.compressed:
+            return np.repeat(buffer >> 6, (buffer & 0x3F).astype(np.int64) + 1)
+        bits = np.unpackbits(buffer)[: 2 * self.length].reshape(-1, 2)
+        return (bits[:, 0] << 1) | bits[:, 1]
+
+    def region(self) -> Tuple[np.ndarray, np.ndarray]:
+        steps = STEPS[self.codes()]
+        rows = np.concatenate(([self.start.y], self.start.y + np.cumsum(steps[:, 0])))
+        columns = np.concatenate(
+            ([self.start.x], self.start.x + np.cumsum(steps[:, 1]))
+        )
+        return rows, columns
+
+    def vertices(self) -> List[Point]:
+        rows, columns = self.region()
+        codes = self.codes()
+        # a vertex is kept wherever the direction changes, plus both ends
+        turns = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        indexes = np.concatenate(([0], turns, [len(rows) - 1]))
+        return [Point(int(columns[i]), int(rows[i])) for i in np.unique(indexes)]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "start": [self.start.x, self.start.y],
+            "length": self.length,
+            "encoding": "rle" if self.compressed else "packed",
+            "data": base64.b64encode(self.data).decode("ascii"),
+        }
+
+    @classmethod
+    def from_json(cls, value: Dict[str, Any]) -> "ChainCode":
+        x, y = value["start"]
+        return cls(
+            Point(int(x), int(y)),
+            int(value["length"]),
+            base64.b64decode(value["data"]),
+            value.get("encoding", "packed") == "rle",
+        )
+
+    def to_svg(self, width: int, height: int, color: Tuple[int, ...]) -> str:
+        # pixel centers sit at half coordinates in SVG user space
+        points = " ".join(f"{x + 0.5},{y + 0.5}" for x, y in self.vertices())
+        stroke = "#{:02x}{:02x}{:02x}".format(*color)
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+            f'height="{height}" viewBox="0 0 {width} {height}">'
+            f'<polyline points="{points}" fill="none" stroke="{stroke}" '
+            f'stroke-width="1"/></svg>\n'
+        )
+
+
+def _run_length(codes: np.ndarray) -> bytes:
+    if codes.size == 0:
+        return b""
+    starts = np.concatenate(([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1))
+    runs = np.diff(np.concatenate((starts, [codes.size])))
+    # runs longer than MAX_RUN are split into several full chunks
+    chunks = (runs + MAX_RUN - 1) // MAX_RUN
+    chunk_codes = np.repeat(codes[starts], chunks)
+    chunk_runs = np.full(chunk_codes.size, MAX_RUN, dtype=np.int64)
+    last_chunks = np.cumsum(chunks) - 1
+    chunk_runs[last_chunks] = runs - (chunks - 1) * MAX_RUN
+    return ((chunk_codes << 6) | (chunk_runs - 1)).astype(np.uint8).tobytes()
+
+
+def encode(rows: Any, columns: Any, compressed: bool = False) -> ChainCode:
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    if rows.size == 0:
+        raise ValueError("Empty path")
+    row_steps, column_steps = np.diff(rows), np.diff(columns)
+    if np.any(np.abs(row_steps) + np.abs(column_steps) != 1):
+        raise ValueError("Path is not 4-connected")
+    codes = (
+        (row_steps == 1) * 1 + (column_steps == -1) * 2 + (row_steps == -1) * 3
+    ).astype(np.uint8)
+    start = Point(int(columns[0]), int(rows[0]))
+    if compressed:
+        return ChainCode(start, codes.size, _run_length(codes), True)
+    bits = np.stack((codes >> 1, codes & 1), axis=1).ravel()
+    return ChainCode(start, codes.size, np.packbits(bits).tobytes())
+
+
+def encode_path(path: List[Point], compressed: bool = True) -> ChainCode:
+    # solver paths hold (y, x) pairs
+    rows, columns = np.asarray(path, dtype=np.int64).reshape(-1, 2).T
+    return encode(rows, columns, compressed)
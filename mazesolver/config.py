@@ -1,7 +1,55 @@
+import os
+
 DEFAULT_RESOLUTION = 300
 DEFAULT_FRAMERATE = 15
 DEFAULT_SCALE_RESOLUTION = 300
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_SOLVERS = 3
+MAX_TILE_WORKERS = 64
+DEFAULT_THRESHOLD = 200
+DEFAULT_ALGORITHM = "BFS"
+ALGORITHMS = ["BFS", "Dijkstra", "A*"]
+WEIGHTED_ALGORITHMS = ["Dijkstra"]
+# strategies raced in portfolio mode, as (algorithm, prune), each finds a path
+# as short, in steps or in cost, as the selected algorithm
+PORTFOLIOS = {
+    "BFS": [("BFS", False), ("A*", False), ("BFS", True)],
+    "A*": [("BFS", False), ("A*", False), ("BFS", True)],
+    "Dijkstra": [("Dijkstra", False), ("Dijkstra", True)],
+}
+DATA_DIRECTORY = os.path.join(os.path.expanduser("~"), ".mazesolver")
+PORTFOLIO_STATS_PATH = os.path.join(DATA_DIRECTORY, "portfolio.json")
+# per solve, in MiB, 0 for no limit
+DEFAULT_MEMORY_BUDGET = 512
+SPILL_DIRECTORY = os.path.join(DATA_DIRECTORY, "spill")
+MAX_PIXEL_COST = 8
+# a lattice must shrink the grid this many times, have this share of its bands
+# within a pixel of the usual width and change at most this share of pixels
+LATTICE_MIN_REDUCTION = 4
+LATTICE_REGULARITY = 0.9
+LATTICE_MAX_MISMATCH = 0.01
+# a search is repaired instead of started over while at most this share of
+# its pixels changed
+REPLAN_MAX_CHANGE = 0.01
 MIN_FRAMERATE = 5
 MAX_FRAMERATE = 60
 MIN_RESOLUTION = 50
 MAX_RESOLUTION = 1200
+MIN_THRESHOLD = 0
+MAX_THRESHOLD = 255
+MAX_ZOOM = 32
+INDEX_EXTENSION = ".mzi"
+PRELOAD_MODULES = ["mazesolver.solver"]
+SOURCE_CACHE_SIZE = 2
+SCALED_CACHE_SIZE = 8
+PRUNED_CACHE_SIZE = 4
+REPLAY_DURATION = 10
+EXPORT_QUEUE_SIZE = 8
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+KEEPALIVE_TIMEOUT = 60
+MAX_REQUEST_SIZE = 16 * 2**20
+MIN_POLL_INTERVAL = 16
+MAX_POLL_INTERVAL = 100
+PUMP_PROBE_INTERVAL = 1
+PUMP_REPORT_INTERVAL = 5
@@ -1,7 +1,14 @@
 from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from mazesolver.chaincode import ChainCode
+from mazesolver.config import WEIGHTED_ALGORITHMS
 from mazesolver.image import MazeImage
-from mazesolver.pubsub import PUBLISHER, Subscriber
+from mazesolver.portfolio import PortfolioStats, get_entries
+from mazesolver.pubsub import PUBLISHER, ControlBlock, Subscriber
+from mazesolver.solver import Solver
 from mazesolver.state import ApplicationState
 from mazesolver.types import Color, Point, RegionOfInterest
 from mazesolver.validation import Validator
@@ -31,10 +38,38 @@ class StateController:
     def set_framerate(self, framerate: str) -> None:
         self.state.framerate = framerate
 
+    def set_algorithm(self, algorithm: str) -> None:
+        self.state.algorithm = algorithm
+
+    def set_max_throughput(self, max_throughput: bool) -> None:
+        self.state.max_throughput = max_throughput
+
+    def set_record(self, record: bool) -> None:
+        self.state.record = record
+
+    def set_prune(self, prune: bool) -> None:
+        self.state.prune = prune
+
+    def set_portfolio(self, portfolio: bool) -> None:
+        self.state.portfolio = portfolio
+
+    def set_lattice(self, lattice: bool) -> None:
+        self.state.lattice = lattice
+
+    def set_replan(self, replan: bool) -> None:
+        self.state.replan = replan
+
     def _setup_subscribers(self) -> None:
         subscribers = [
             Subscriber("FramerateChangeRequest", function=self.set_framerate),
             Subscriber("ResolutionChangeRequest", function=self.set_resolution),
+            Subscriber("AlgorithmChangeRequest", function=self.set_algorithm),
+            Subscriber("ThroughputChangeRequest", function=self.set_max_throughput),
+            Subscriber("RecordChangeRequest", function=self.set_record),
+            Subscriber("PruneChangeRequest", function=self.set_prune),
+            Subscriber("PortfolioChangeRequest", function=self.set_portfolio),
+            Subscriber("LatticeChangeRequest", function=self.set_lattice),
+            Subscriber("ReplanChangeRequest", function=self.set_replan),
         ]
         for subscriber in subscribers:
             PUBLISHER.register_subscriber(subscriber)
@@ -124,6 +159,8 @@ class ImageController:
         self.state = state
         self.validator = validator
         self.image = self.state.image
+        self.generation = 0
+        self.job: Optional[int] = None
         self._setup_subscribers()
 
     def image_selection(self, image_path: str) -> None:
@@ -132,10 +169,61 @@ class ImageController:
             self.image.scaled_resolution = int(self.state.resolution)
         except ValueError:
             return
+        self.generation += 1
+        PUBLISHER.queue_thread_message(
+            "ImageLoader",
+            image_path=image_path,
+            resolution=self.image.scaled_resolution,
+            threshold=self.image.threshold,
+            generation=self.generation,
+        )
+
+    def image_loaded(
+        self,
+        generation: int,
+        image_path: str,
+        pixels: np.ndarray,
+        passable: np.ndarray,
+        derived: Dict[str, np.ndarray],
+        timings: Dict[str, float],
+    ) -> None:
+        if generation != self.generation:
+            return
         self.image.overlay.clear()
+        self.image.set_pixels(pixels, passable, packed=True, derived=derived)
+        self.image.load_timings = timings
         PUBLISHER.queue_message("ImageChangeRequest", image_path=image_path)
 
-    def image_reset(self) -> None:
+    def image_threshold(self, threshold: int) -> None:
+        # a solve in progress keeps the walls it started with
+        if self.state.working:
+            return
+        self.image.set_threshold(threshold)
+        if not self.image.loaded:
+            return
+        self.image.overlay.clear()
+        PUBLISHER.queue_message("ImageUpdateRequest")
+
+    def image_reset(self, job: Optional[int] = None) -> None:
+        # a cancelled job's late reset would wipe the next job's pixels
+        if job != self.job:
+            return
+        self.image.reset_result()
+        PUBLISHER.queue_message("ImageUpdateRequest")
+
+    def solve_started(self, job: Optional[int]) -> None:
+        self.job = job
+
+    def solve_done(self, job: int, **kwargs: Any) -> None:
+        if job == self.job:
+            self.job = None
+
+    def solve_cancelled(self) -> None:
+        if self.job is None:
+            return
+        # the cancelled job's own reset comes too late to be told apart from
+        # a stale one, so the image is reset here
+        self.job = None
         self.image.reset_result()
         PUBLISHER.queue_message("ImageUpdateRequest")
 
@@ -145,17 +233,35 @@ class ImageController:
             self.validator.validate_save_format(image_path)
         except ValueError:
             return
+        if self.validator.is_path_format(image_path):
+            try:
+                self.validator.validate_solution()
+            except ValueError:
+                return
+            self.image.save_path(image_path)
+            return
         self.image.save_result(image_path)
 
-    def image_loading_error(self) -> None:
+    def image_loading_error(self, generation: int) -> None:
+        if generation != self.generation:
+            return
+        self.image.loaded = False
+        self.image.overlay.clear()
+        PUBLISHER.queue_message("ImageClearRequest")
         self.validator.image_validator.show_image_loading_error()
 
     def _setup_subscribers(self) -> None:
         subscribers = [
             Subscriber("ImageSelectionRequest", function=self.image_selection),
+            Subscriber("ImageLoadDone", function=self.image_loaded),
             Subscriber("ImageResetRequest", function=self.image_reset),
+            Subscriber("ImageThresholdRequest", function=self.image_threshold),
             Subscriber("ImageSaveRequest", function=self.image_save),
             Subscriber("ImageLoadingError", function=self.image_loading_error),
+            Subscriber("MazeSolveStarted", function=self.solve_started),
+            Subscriber("MazeCancelRequest", function=self.solve_cancelled),
+            Subscriber("MazeSolveDone", function=self.solve_done),
+            Subscriber("MazeSolveCancelled", function=self.solve_done),
         ]
         for subscriber in subscribers:
             PUBLISHER.register_subscriber(subscriber)
@@ -168,6 +274,8 @@ class MazeController:
         self.state = state
         self.validator = validator
         self.image = self.state.image
+        self.job: Optional[int] = None
+        self.portfolio = PortfolioStats()
         self._setup_subscribers()
 
     def maze_solve(self) -> None:
@@ -177,28 +285,78 @@ class MazeController:
         except ValueError:
             return
         self.image.reset_result()
-        PUBLISHER.queue_process_message("Maze", start=True, state=self.state)
+        lattice = self.image.get_lattice() if self.state.lattice else None
+        if lattice is not None:
+            # the cells are small enough for the solver to prepare on its own
+            PUBLISHER.queue_message(
+                "MazeLattice",
+                shape=lattice.shape,
+                pitch=lattice.pitch,
+                wall=lattice.wall,
+            )
+        elif self.state.algorithm in WEIGHTED_ALGORITHMS:
+            # computed here so the cached map travels with the image
+            self.image.get_cost_map()
+        if self.state.portfolio:
+            # the pruned strategies prune inside the race, so it counts
+            self.job = PUBLISHER.race_jobs("Maze", get_entries(self.state))
+            if self.job is not None:
+                self.portfolio.start(self.job, self.image)
+        else:
+            self._submit(prune=self.state.prune and lattice is None)
         self.state.working = True
+        PUBLISHER.queue_message("MazeSolveStarted", job=self.job)
+
+    def _submit(self, prune: bool) -> None:
+        if prune:
+            # cutting corners keeps step counts but not weighted costs
+            _, pruned = self.image.get_pruned(
+                self.state.start_point,
+                self.state.end_point,
+                cut_corners=self.state.algorithm not in WEIGHTED_ALGORITHMS,
+            )
+            PUBLISHER.queue_message("MazePruned", pruned=pruned)
+        # the worker that solved this maze last can repair its search
+        self.job = PUBLISHER.submit_job(
+            "Maze", affinity=self.image.maze_key, start=True, state=self.state
+        )
 
     def maze_stop(self) -> None:
-        PUBLISHER.queue_process_message("Maze", stop=True)
+        if self.job is not None:
+            PUBLISHER.control_job("Maze", self.job, ControlBlock.STOP)
 
     def maze_resume(self) -> None:
-        PUBLISHER.queue_process_message("Maze", resume=True)
+        if self.job is not None:
+            PUBLISHER.control_job("Maze", self.job, ControlBlock.RUN)
 
     def maze_reset(self) -> None:
-        PUBLISHER.queue_process_message(
-            "Maze",
-            reset=True,
-            wait_for_response=True,
-            message_timeout=0.2,
-            response_timeout=0.2,
-        )
+        if self.job is not None:
+            PUBLISHER.cancel_job("Maze", self.job, wait_for_response=True, timeout=0.2)
+        self.job = None
         self.state.working = False
 
-    def maze_solve_done(self) -> None:
+    def maze_solve_done(
+        self,
+        job: int,
+        length: Optional[int] = None,
+        stats: Optional[Dict[str, float]] = None,
+    ) -> None:
+        if job != self.job:
+            return
+        self.job = None
         self.state.working = False
 
+    def maze_race_done(
+        self,
+        job: int,
+        winner: Optional[str],
+        elapsed: Dict[str, Optional[float]],
+        results: Dict[str, Optional[Dict[str, Any]]],
+    ) -> None:
+        summary = self.portfolio.record(job, winner, elapsed, results)
+        if summary is not None:
+            PUBLISHER.queue_message("PortfolioResult", summary=summary)
+
     def _setup_subscribers(self) -> None:
         subscribers = [
             Subscriber("MazeSolveRequest", function=self.maze_solve),
@@ -206,6 +364,114 @@ class MazeController:
             Subscriber("MazeResumeRequest", function=self.maze_resume),
             Subscriber("MazeCancelRequest", function=self.maze_reset),
             Subscriber("MazeSolveDone", function=self.maze_solve_done),
+            Subscriber("MazeSolveCancelled", function=self.maze_solve_done),
+            Subscriber("RaceDone", function=self.maze_race_done),
+        ]
+        for subscriber in subscribers:
+            PUBLISHER.register_subscriber(subscriber)
+
+
+class ExportController:
+    def __init__(self, state: ApplicationState, validator: Validator) -> None:
+        self.state = state
+        self.validator = validator
+        self.image = self.state.image
+        self.image_path: Optional[str] = None
+        self.job: Optional[int] = None
+        # deltas the exporter had no room for, merged into runs of one color
+        self.pending: List[Tuple[Color, List[Any]]] = []
+        self._setup_subscribers()
+
+    def export_request(self, image_path: str) -> None:
+        try:
+            self.validator.validate_image()
+        except ValueError:
+            return
+        self.image_path = image_path
+
+    def export_start(self, job: int) -> None:
+        if self.image_path is None:
+            return
+        self.job = job
+        self.pending = []
+        colors = [
+            Solver.VISITED_COLOR,
+            Solver.SOLUTION_COLOR,
+            PointController.START_COLOR,
+            PointController.END_COLOR,
+        ]
+        self._send(
+            start=True,
+            image_path=self.image_path,
+            base=self.image.materialize(),
+            framerate=int(self.state.framerate),
+            colors=colors,
+        )
+        self.image_path = None
+
+    def export_frame(
+        self, region: Any, color: Color, job: Optional[int] = None
+    ) -> None:
+        if job is None or job != self.job:
+            return
+        if self.pending and self.pending[-1][0] == color:
+            self.pending[-1][1].append(region)
+        else:
+            self.pending.append((color, [region]))
+        self._flush(block=False)
+
+    def _flush(self, block: bool) -> None:
+        if not self.pending:
+            return
+        deltas = []
+        for color, regions in self.pending:
+            rows = np.concatenate([region[0] for region in regions])
+            columns = np.concatenate([region[1] for region in regions])
+            deltas.append(((rows, columns), color))
+        if block:
+            self._send(frame=True, deltas=deltas)
+        elif not PUBLISHER.queue_thread_message("Exporter", frame=True, deltas=deltas):
+            return
+        self.pending = []
+
+    def _send(self, **kwargs: Any) -> None:
+        # waits for room in the queue, the exporter never answers
+        PUBLISHER.queue_thread_message(
+            "Exporter", wait_for_response=True, response_timeout=0, **kwargs
+        )
+
+    def export_path(
+        self, path: ChainCode, color: Color, job: Optional[int] = None
+    ) -> None:
+        self.export_frame(path.region(), color, job)
+
+    def export_reset(self, job: Optional[int] = None) -> None:
+        if job is None or job != self.job:
+            return
+        # the deltas waiting to be sent are cleared by the reset anyway
+        self.pending = []
+        self._send(reset=True)
+
+    def export_finish(self, job: int, **kwargs: Any) -> None:
+        if job != self.job:
+            return
+        self.job = None
+        self._flush(block=True)
+        self._send(finish=True)
+
+    def export_error(self, image_path: str) -> None:
+        self.validator.image_validator.show_export_error(image_path)
+
+    def _setup_subscribers(self) -> None:
+        subscribers = [
+            Subscriber("ExportRequest", function=self.export_request),
+            Subscriber("MazeSolveStarted", function=self.export_start),
+            Subscriber("ImagePixelReplaceRequest", function=self.export_frame),
+            Subscriber("ImagePathReplaceRequest", function=self.export_path),
+            Subscriber("ImageResetRequest", function=self.export_reset),
+            Subscriber("MazeSolveDone", function=self.export_finish),
+            Subscriber("MazeSolveCancelled", function=self.export_finish),
+            Subscriber("ExportError", function=self.export_error),
         ]
         for subscriber in subscribers:
             PUBLISHER.register_subscriber(subscriber)
@@ -223,3 +489,4 @@ class ApplicationController:
         point_controller = PointController(self.state)
         image_controller = ImageController(self.state, self.validator)
         maze_controller = MazeController(self.state, self.validator)
+        export_controller = ExportController(self.state, self.validator)
@@ -0,0 +1,178 @@
+import os.path
+from abc import ABC, abstractmethod
+from queue import Empty, Full
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from mazesolver.config import EXPORT_QUEUE_SIZE
+from mazesolver.lazy import LazyModule
+from mazesolver.pubsub import ThreadWorker
+from mazesolver.types import Color
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PILImage
+
+GifImagePlugin = LazyModule("PIL.GifImagePlugin")
+Image = LazyModule("PIL.Image")
+
+
+class FrameWriter(ABC):
+    def __init__(self) -> None:
+        self.frames = 0
+
+    @abstractmethod
+    def write(self, frame: np.ndarray) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ImageSequenceWriter(FrameWriter):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        root, extension = os.path.splitext(path)
+        self.pattern = f"{root}_{{:05d}}{extension or '.png'}"
+
+    def write(self, frame: np.ndarray) -> None:
+        Image.fromarray(frame).save(self.pattern.format(self.frames))
+        self.frames += 1
+
+
+class GifWriter(FrameWriter):
+    def __init__(self, path: str, duration: int, colors: Iterable[Color]) -> None:
+        super().__init__()
+        self.file: BinaryIO = open(path, "wb")
+        self.duration = duration
+        self.colors = list(colors)
+        self.palette: Optional["PILImage"] = None
+
+    def _build_palette(self, frame: np.ndarray) -> "PILImage":
+        # the palette is fixed by the first frame, with the overlay colors
+        # reserved, so every later frame can be quantized without analysis
+        reserved = len(self.colors)
+        palette = Image.fromarray(frame).quantize(colors=256 - reserved)
+        entries = palette.getpalette()[: (256 - reserved) * 3]
+        for color in self.colors:
+            entries.extend(color)
+        palette.putpalette(entries)
+        return palette
+
+    def write(self, frame: np.ndarray) -> None:
+        if self.palette is None:
+            self.palette = self._build_palette(frame)
+        image = Image.fromarray(frame).quantize(
+            palette=self.palette, dither=Image.Dither.NONE
+        )
+        if self.frames == 0:
+            header, _ = GifImagePlugin.getheader(
+                image, info={"loop": 0, "optimize": False}
+            )
+            for chunk in header:
+                self.file.write(chunk)
+        for chunk in GifImagePlugin.getdata(image, duration=self.duration):
+            self.file.write(chunk)
+        self.frames += 1
+
+    def close(self) -> None:
+        if self.frames:
+            self.file.write(b";")
+        self.file.close()
+
+
+class AnimationExporter(ThreadWorker):
+    GIF_FORMATS = [".GIF"]
+
+    def __init__(self) -> None:
+        # a full queue makes the sender merge its deltas, so memory does not
+        # grow with the frames waiting to be encoded
+        super().__init__(daemon=True, input_size=EXPORT_QUEUE_SIZE)
+        self.base: np.ndarray = np.zeros(0)
+        self.canvas: np.ndarray = np.zeros(0)
+        self.writer: Optional[FrameWriter] = None
+        self.path = ""
+
+    def _send(self, kwargs: Dict[str, Any]) -> None:
+        try:
+            self.output_queue.put(kwargs, block=True, timeout=0.5)
+        except Full:
+            pass
+
+    def _start(self, path: str, base: np.ndarray, framerate: int, colors: Any) -> None:
+        self._finish()
+        self.path = path
+        self.base = base
+        self.canvas = base.copy()
+        extension = os.path.splitext(path)[1].upper()
+        if extension in self.GIF_FORMATS:
+            self.writer = GifWriter(path, 1000 // framerate, colors)
+        else:
+            self.writer = ImageSequenceWriter(path)
+        self.writer.write(self.canvas)
+
+    def _add_frame(self, deltas: List[Tuple[Any, Color]]) -> None:
+        if self.writer is None:
+            return
+        for region, color in deltas:
+            self.canvas[region] = color
+        self.writer.write(self.canvas)
+
+    def _reset(self) -> None:
+        if self.writer is None:
+            return
+        self.canvas = self.base.copy()
+        self.writer.write(self.canvas)
+
+    def _finish(self) -> None:
+        if self.writer is None:
+            return
+        self.writer.close()
+        self._send(
+            {
+                "topic": "ExportDone",
+                "image_path": self.path,
+                "frames": self.writer.frames,
+            }
+        )
+        self.writer = None
+        self.base = self.canvas = np.zeros(0)
+
+    def _abort(self) -> None:
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except OSError:
+                pass
+        self.writer = None
+        self.base = self.canvas = np.zeros(0)
+
+    def _process_message(self, kwargs: Dict[str, Any]) -> None:
+        if kwargs.get("start", False):
+            self._start(
+                kwargs["image_path"],
+                kwargs["base"],
+                kwargs["framerate"],
+                kwargs["colors"],
+            )
+        elif kwargs.get("frame", False):
+            self._add_frame(kwargs["deltas"])
+        elif kwargs.get("reset", False):
+            self._reset()
+        elif kwargs.get("finish", False):
+            self._finish()
+
+    def run(self) -> None:
+        while True:
+            self.received.wait()
+            self.received.clear()
+            while True:
+                try:
+                    kwargs = self.input_queue.get_nowait()
+                except Empty:
+                    break
+                try:
+                    self._process_message(kwargs)
+                except (OSError, ValueError):
+                    self._abort()
+                    self._send({"topic": "ExportError", "image_path": self.path})
@@ -1,12 +1,30 @@
 import importlib.resources
+import os.path
 import tkinter as tk
 from tkinter import filedialog, ttk
-from typing import Any, Union
-
-from mazesolver.config import DEFAULT_FRAMERATE, DEFAULT_RESOLUTION
+from typing import Any, Optional, Set, Tuple, Union
+
+from mazesolver.chaincode import ChainCode
+from mazesolver.config import (
+    ALGORITHMS,
+    DEFAULT_ALGORITHM,
+    DEFAULT_FRAMERATE,
+    DEFAULT_RESOLUTION,
+    DEFAULT_THRESHOLD,
+    MAX_FRAMERATE,
+    MAX_POLL_INTERVAL,
+    MAX_THRESHOLD,
+    MIN_FRAMERATE,
+    MIN_POLL_INTERVAL,
+    MIN_THRESHOLD,
+    REPLAY_DURATION,
+)
 from mazesolver.image import MazeImage
 from mazesolver.pubsub import PUBLISHER, Subscriber
+from mazesolver.recording import Recording
+from mazesolver.solver import Solver
 from mazesolver.types import Color, Size
+from mazesolver.viewport import Viewport
 
 
 class GuiElement:
@@ -24,14 +42,20 @@ class GuiElement:
 class ImageArea(GuiElement):
     MAX_WIDTH = 600
     MAX_HEIGHT = 600
+    ZOOM_STEP = 1.25
 
     def __init__(self, parent: Union[tk.Widget, tk.Tk], image: MazeImage) -> None:
         super().__init__(parent)
         self.label = ttk.Label(self.frame)
+        self.status = ttk.Label(self.frame)
         self.image = image
+        self.viewport = Viewport(Size(self.MAX_WIDTH, self.MAX_HEIGHT))
+        self._drag_position: Optional[Tuple[int, int]] = None
+        self._update_pending = False
+        self.job: Optional[int] = None
 
     def _get_scaled_size(self) -> Size:
-        height, width, _ = self.image.pixels.shape
+        height, width = self.image.shape
         ratio = width / height
         if width > height:
             scaled_width = self.MAX_WIDTH
@@ -47,17 +71,59 @@ class ImageArea(GuiElement):
             return
         x: int = event.x  # type: ignore[attr-defined]
         y: int = event.y  # type: ignore[attr-defined]
-        scaled_width, scaled_height = self._get_scaled_size()
-        height, width, _ = self.image.pixels.shape
-        real_x = int(x * (width / scaled_width))
-        real_y = int(y * (height / scaled_height))
-        PUBLISHER.queue_message("ImageClicked", x=real_x, y=real_y)
+        real_x, real_y = self.viewport.to_image(x, y)
+        height, width = self.image.shape
+        if 0 <= real_x < width and 0 <= real_y < height:
+            PUBLISHER.queue_message("ImageClicked", x=real_x, y=real_y)
+
+    def _wheel_turned(self, event: tk.Event) -> None:
+        if not self.image.loaded:
+            return
+        x: int = event.x  # type: ignore[attr-defined]
+        y: int = event.y  # type: ignore[attr-defined]
+        delta: int = event.delta  # type: ignore[attr-defined]
+        button: Any = event.num  # type: ignore[attr-defined]
+        # X11 reports the wheel as buttons 4 and 5 instead of a delta
+        factor = self.ZOOM_STEP if button == 4 or delta > 0 else 1 / self.ZOOM_STEP
+        if self.viewport.zoom_at(factor, x, y):
+            self._schedule_update()
+
+    def _drag_started(self, event: tk.Event) -> None:
+        self._drag_position = (event.x, event.y)  # type: ignore[attr-defined]
+
+    def _dragged(self, event: tk.Event) -> None:
+        if not self.image.loaded or self._drag_position is None:
+            return
+        x: int = event.x  # type: ignore[attr-defined]
+        y: int = event.y  # type: ignore[attr-defined]
+        self.viewport.pan(x - self._drag_position[0], y - self._drag_position[1])
+        self._drag_position = (x, y)
+        self._schedule_update()
+
+    def _fit_view(self) -> None:
+        height, width = self.image.shape
+        self.viewport.fit(Size(width, height), self._get_scaled_size())
+
+    def _reset_view(self, event: tk.Event) -> None:
+        if not self.image.loaded:
+            return
+        self._fit_view()
+        self._schedule_update()
+
+    def _schedule_update(self) -> None:
+        # a burst of events is drawn once
+        if not self._update_pending:
+            self._update_pending = True
+            self.frame.after_idle(self.update_image)
 
     def update_image(self) -> None:
+        self._update_pending = False
         if not self.image.loaded:
             return
-        size = self._get_scaled_size()
-        tk_image = self.image.get_tk_image(size)
+        height, width = self.image.shape
+        if self.viewport.image_size != (width, height):
+            self._fit_view()
+        tk_image = self.image.get_tk_image(self.viewport)
         self.label.configure(image=tk_image)
         self.label.image = tk_image  # type: ignore[attr-defined]
 
@@ -66,28 +132,114 @@ class ImageArea(GuiElement):
         self.label.image = None  # type: ignore[attr-defined]
 
     def change_image(self, image_path: str) -> None:
-        try:
-            self.image.load_image(image_path)
-        except ValueError:
-            self.clear_image()
-            PUBLISHER.queue_message("ImageLoadingError")
+        memory = sum(self.image.memory_usage().values())
+        self.status.configure(text=f"Image memory: {memory / 2 ** 20:.1f} MiB")
+        if self.image.loaded:
+            self._fit_view()
         self.update_image()
 
-    def replace_pixels(self, region: Any, color: Color) -> None:
-        self.image.result[region] = color
-        self.update_image()
+    def show_progress(self, generation: int, step: str, progress: float) -> None:
+        self.status.configure(text=f"Loading image: {step} ({progress:.0%})")
+
+    def hide_progress(self, *args: Any, **kwargs: Any) -> None:
+        self.status.configure(text="")
+
+    def show_pruned(self, pruned: int) -> None:
+        self.status.configure(text=f"Dead ends pruned: {pruned} pixels")
+
+    def show_portfolio(self, summary: str) -> None:
+        self.status.configure(text=summary)
+
+    def show_lattice(self, shape: Tuple[int, int], pitch: float, wall: float) -> None:
+        height, width = shape
+        self.status.configure(
+            text=(
+                f"Solving on {width}x{height} cells "
+                f"(pitch {pitch:.1f} px, walls {wall:.1f} px)"
+            )
+        )
+
+    def show_degraded(
+        self, storage: str, projected: int, budget: int, job: Optional[int] = None
+    ) -> None:
+        self.status.configure(
+            text=(
+                f"Projected {projected / 2 ** 20:.1f} MiB over the "
+                f"{budget / 2 ** 20:.0f} MiB budget, solving with {storage} storage"
+            )
+        )
+
+    def show_replanned(self, changed: int, job: Optional[int] = None) -> None:
+        self.status.configure(
+            text=f"Repairing the last search around {changed} changed pixels"
+        )
+
+    def solve_started(self, job: Optional[int]) -> None:
+        self.job = job
+
+    def solve_cancelled(self) -> None:
+        self.job = None
+
+    def show_exported(self, image_path: str, frames: int) -> None:
+        name = os.path.basename(image_path)
+        self.status.configure(text=f"Export finished: {frames} frames to {name}")
+
+    def show_export_failed(self, image_path: str) -> None:
+        name = os.path.basename(image_path)
+        self.status.configure(text=f"Export failed: {name}")
+
+    def replace_pixels(
+        self, region: Any, color: Color, job: Optional[int] = None
+    ) -> None:
+        # a cancelled job can still be sending, and must not paint over the
+        # next one
+        if job != self.job:
+            return
+        self.image.paint(region, color)
+        # pixels outside the view are kept but not drawn, and a race's
+        # messages arriving together are drawn once
+        if self.viewport.contains(region):
+            self._schedule_update()
+
+    def replace_path(
+        self, path: ChainCode, color: Color, job: Optional[int] = None
+    ) -> None:
+        if job != self.job:
+            return
+        self.image.set_solution_path(path, color)
+        if self.viewport.contains(path.region()):
+            self._schedule_update()
 
     def _setup(self) -> None:
         self.frame.configure(padding=20)
         self.label.grid(column=0, row=0)
+        self.status.grid(column=0, row=1, sticky="W")
         self.label.bind("<Button-1>", self._image_clicked)
+        for sequence in ["<MouseWheel>", "<Button-4>", "<Button-5>"]:
+            self.label.bind(sequence, self._wheel_turned)
+        self.label.bind("<ButtonPress-3>", self._drag_started)
+        self.label.bind("<B3-Motion>", self._dragged)
+        self.label.bind("<Double-Button-3>", self._reset_view)
         self._setup_subscribers()
 
     def _setup_subscribers(self) -> None:
         subscribers = [
             Subscriber("ImageChangeRequest", function=self.change_image),
+            Subscriber("ImageClearRequest", function=self.clear_image),
+            Subscriber("ImageLoadProgress", function=self.show_progress),
+            Subscriber("ImageLoadingError", function=self.hide_progress),
+            Subscriber("MazePruned", function=self.show_pruned),
+            Subscriber("PortfolioResult", function=self.show_portfolio),
+            Subscriber("MazeSolveDegraded", function=self.show_degraded),
+            Subscriber("MazeLattice", function=self.show_lattice),
+            Subscriber("MazeReplanned", function=self.show_replanned),
+            Subscriber("ExportDone", function=self.show_exported),
+            Subscriber("ExportError", function=self.show_export_failed),
             Subscriber("ImageUpdateRequest", function=self.update_image),
             Subscriber("ImagePixelReplaceRequest", function=self.replace_pixels),
+            Subscriber("ImagePathReplaceRequest", function=self.replace_path),
+            Subscriber("MazeSolveStarted", function=self.solve_started),
+            Subscriber("MazeCancelRequest", function=self.solve_cancelled),
         ]
         for subscriber in subscribers:
             PUBLISHER.register_subscriber(subscriber)
@@ -147,21 +299,40 @@ class SaveControl(GuiElement):
     def __init__(self, parent: Union[tk.Widget, tk.Tk]):
         super().__init__(parent)
         self.save_button = ttk.Button(self.frame, text="Save Image")
+        self.export_button = ttk.Button(self.frame, text="Export Animation")
 
     def save_command(self) -> None:
         filename = filedialog.asksaveasfilename(
             title="Save Image",
             defaultextension="png",
-            filetypes=[("PNG", ".png"), ("JPG", ".jpg"), ("JPEG", ".jpeg")],
+            filetypes=[
+                ("PNG", ".png"),
+                ("JPG", ".jpg"),
+                ("JPEG", ".jpeg"),
+                ("Solution Path (JSON)", ".json"),
+                ("Solution Path (SVG)", ".svg"),
+            ],
         )
         if not filename:
             return
         PUBLISHER.queue_message("ImageSaveRequest", image_path=filename)
 
+    def export_command(self) -> None:
+        filename = filedialog.asksaveasfilename(
+            title="Export Animation of the Next Solve",
+            defaultextension="gif",
+            filetypes=[("GIF", ".gif"), ("PNG Sequence", ".png")],
+        )
+        if not filename:
+            return
+        PUBLISHER.queue_message("ExportRequest", image_path=filename)
+
     def _setup(self) -> None:
         self.frame.columnconfigure(0, weight=1)
-        self.save_button.grid(column=0, row=0, sticky="WE")
+        self.save_button.grid(column=0, row=0, sticky="WE", pady=(0, 10))
+        self.export_button.grid(column=0, row=1, sticky="WE")
         self.save_button.configure(command=self.save_command)
+        self.export_button.configure(command=self.export_command)
 
 
 class PointsControl(GuiElement):
@@ -213,12 +384,42 @@ class ResolutionControl(GuiElement):
             PUBLISHER.register_subscriber(subscriber)
 
 
+class ThresholdControl(GuiElement):
+    def __init__(self, parent: Union[tk.Widget, tk.Tk]) -> None:
+        super().__init__(parent)
+        self.label = ttk.Label(self.frame, text="Threshold")
+        self.spinbox = ttk.Spinbox(
+            self.frame, from_=MIN_THRESHOLD, to=MAX_THRESHOLD, increment=5, width=10
+        )
+        self.string_var = tk.StringVar(value=f"{DEFAULT_THRESHOLD}")
+
+    def _entry_changed(self, *_: Any) -> None:
+        # the maze is thresholded again on every change, so only whole values
+        # in range are sent
+        try:
+            threshold = int(self.string_var.get())
+        except ValueError:
+            return
+        if MIN_THRESHOLD <= threshold <= MAX_THRESHOLD:
+            PUBLISHER.queue_message("ImageThresholdRequest", threshold=threshold)
+
+    def _setup(self) -> None:
+        self.frame.columnconfigure(0, minsize=100)
+        self.frame.columnconfigure(1, weight=1)
+        self.label.grid(column=0, row=0, padx=(0, 10), sticky="W")
+        self.spinbox.grid(column=1, row=0, sticky="WE")
+        self.spinbox.configure(textvariable=self.string_var)
+        self.string_var.trace_add("write", self._entry_changed)
+
+
 class FramerateControl(GuiElement):
     def __init__(self, parent: Union[tk.Widget, tk.Tk]) -> None:
         super().__init__(parent)
         self.label = ttk.Label(self.frame, text="Framerate")
         self.entry = ttk.Entry(self.frame, width=10)
         self.string_var = tk.StringVar(value=f"{DEFAULT_FRAMERATE}")
+        self.skip_button = ttk.Checkbutton(self.frame, text="Skip Animation")
+        self.skip_var = tk.BooleanVar(value=False)
         self._setup_subscribers()
 
     def reset(self) -> None:
@@ -228,13 +429,22 @@ class FramerateControl(GuiElement):
         framerate = self.string_var.get()
         PUBLISHER.queue_message("FramerateChangeRequest", framerate=framerate)
 
+    def _skip_changed(self, *_: Any) -> None:
+        max_throughput = self.skip_var.get()
+        PUBLISHER.queue_message(
+            "ThroughputChangeRequest", max_throughput=max_throughput
+        )
+
     def _setup(self) -> None:
         self.frame.columnconfigure(0, minsize=100)
         self.frame.columnconfigure(1, weight=1)
         self.label.grid(column=0, row=0, padx=(0, 10), sticky="W")
         self.entry.grid(column=1, row=0, sticky="WE")
+        self.skip_button.grid(column=0, row=1, columnspan=2, sticky="W", pady=(10, 0))
         self.entry.configure(textvariable=self.string_var)
+        self.skip_button.configure(variable=self.skip_var)
         self.string_var.trace_add("write", self._entry_changed)
+        self.skip_var.trace_add("write", self._skip_changed)
 
     def _setup_subscribers(self) -> None:
         subscribers = [Subscriber("FramerateResetRequest", function=self.reset)]
@@ -242,15 +452,219 @@ class FramerateControl(GuiElement):
             PUBLISHER.register_subscriber(subscriber)
 
 
-class ControlArea(GuiElement):
+class AlgorithmControl(GuiElement):
     def __init__(self, parent: Union[tk.Widget, tk.Tk]) -> None:
+        super().__init__(parent)
+        self.label = ttk.Label(self.frame, text="Algorithm")
+        self.combobox = ttk.Combobox(self.frame, width=10, state="readonly")
+        self.string_var = tk.StringVar(value=DEFAULT_ALGORITHM)
+        self.prune_button = ttk.Checkbutton(self.frame, text="Prune Dead Ends")
+        self.prune_var = tk.BooleanVar(value=False)
+        self.portfolio_button = ttk.Checkbutton(self.frame, text="Race Strategies")
+        self.portfolio_var = tk.BooleanVar(value=False)
+        self.lattice_button = ttk.Checkbutton(self.frame, text="Solve on Maze Cells")
+        self.lattice_var = tk.BooleanVar(value=False)
+        self.replan_button = ttk.Checkbutton(self.frame, text="Repair Last Search")
+        self.replan_var = tk.BooleanVar(value=False)
+
+    def _selection_changed(self, *_: Any) -> None:
+        algorithm = self.string_var.get()
+        PUBLISHER.queue_message("AlgorithmChangeRequest", algorithm=algorithm)
+
+    def _prune_changed(self, *_: Any) -> None:
+        PUBLISHER.queue_message("PruneChangeRequest", prune=self.prune_var.get())
+
+    def _portfolio_changed(self, *_: Any) -> None:
+        portfolio = self.portfolio_var.get()
+        PUBLISHER.queue_message("PortfolioChangeRequest", portfolio=portfolio)
+
+    def _lattice_changed(self, *_: Any) -> None:
+        PUBLISHER.queue_message("LatticeChangeRequest", lattice=self.lattice_var.get())
+
+    def _replan_changed(self, *_: Any) -> None:
+        PUBLISHER.queue_message("ReplanChangeRequest", replan=self.replan_var.get())
+
+    def _setup(self) -> None:
+        self.frame.columnconfigure(0, minsize=100)
+        self.frame.columnconfigure(1, weight=1)
+        self.label.grid(column=0, row=0, padx=(0, 10), sticky="W")
+        self.combobox.grid(column=1, row=0, sticky="WE")
+        self.combobox.configure(values=ALGORITHMS, textvariable=self.string_var)
+        self.string_var.trace_add("write", self._selection_changed)
+        self.prune_button.grid(column=0, row=1, columnspan=2, sticky="W", pady=(10, 0))
+        self.prune_button.configure(variable=self.prune_var)
+        self.prune_var.trace_add("write", self._prune_changed)
+        self.portfolio_button.grid(
+            column=0, row=2, columnspan=2, sticky="W", pady=(10, 0)
+        )
+        self.portfolio_button.configure(variable=self.portfolio_var)
+        self.portfolio_var.trace_add("write", self._portfolio_changed)
+        self.lattice_button.grid(
+            column=0, row=3, columnspan=2, sticky="W", pady=(10, 0)
+        )
+        self.lattice_button.configure(variable=self.lattice_var)
+        self.lattice_var.trace_add("write", self._lattice_changed)
+        self.replan_button.grid(column=0, row=4, columnspan=2, sticky="W", pady=(10, 0))
+        self.replan_button.configure(variable=self.replan_var)
+        self.replan_var.trace_add("write", self._replan_changed)
+
+
+class PlaybackControl(GuiElement):
+    def __init__(self, parent: Union[tk.Widget, tk.Tk], image: MazeImage) -> None:
+        super().__init__(parent)
+        self.image = image
+        self.recording: Optional[Recording] = None
+        self.position = 0
+        self.playing = False
+        self.framerate = DEFAULT_FRAMERATE
+        self.job: Optional[int] = None
+        self._after_id: Optional[str] = None
+        self.record_button = ttk.Checkbutton(self.frame, text="Record for Replay")
+        self.record_var = tk.BooleanVar(value=False)
+        self.play_button = ttk.Button(self.frame, text="Play")
+        self.pause_button = ttk.Button(self.frame, text="Pause")
+        self.scale = ttk.Scale(self.frame, from_=0, to=0)
+        self._setup_subscribers()
+
+    def load(self, order: Any, solution: Any, job: Optional[int] = None) -> None:
+        self.pause()
+        self.recording = Recording(order, solution)
+        self.position = len(self.recording)
+        self.scale.configure(to=self.position)
+        self.scale.set(self.position)
+
+    def clear(self, *args: Any, **kwargs: Any) -> None:
+        self.pause()
+        self.recording = None
+        self.position = 0
+        self.scale.configure(to=0)
+        self.scale.set(0)
+
+    def reset(self, job: Optional[int] = None) -> None:
+        if job != self.job:
+            return
+        self.clear()
+
+    def solve_started(self, job: Optional[int]) -> None:
+        self.job = job
+
+    def solve_done(self, job: int, **kwargs: Any) -> None:
+        if job == self.job:
+            self.job = None
+
+    def solve_cancelled(self) -> None:
+        if self.job is None:
+            return
+        self.job = None
+        self.clear()
+
+    def set_framerate(self, framerate: str) -> None:
+        try:
+            integer_framerate = int(framerate)
+        except ValueError:
+            return
+        if MIN_FRAMERATE <= integer_framerate <= MAX_FRAMERATE:
+            self.framerate = integer_framerate
+
+    def seek(self, position: int) -> None:
+        if self.recording is None:
+            return
+        position = min(max(position, 0), len(self.recording))
+        if position == self.position:
+            return
+        if position > self.position:
+            region = self.recording.region(self.position, position)
+            self.image.paint(region, Solver.VISITED_COLOR)
+        else:
+            self.image.erase(self.recording.region(position, self.position))
+        if position == len(self.recording):
+            self.image.paint(self.recording.solution, Solver.SOLUTION_COLOR)
+        else:
+            visited, hidden = self.recording.split_solution(position)
+            self.image.paint(visited, Solver.VISITED_COLOR)
+            self.image.erase(hidden)
+        self.position = position
+        self.scale.set(position)
+        PUBLISHER.queue_message("ImageUpdateRequest")
+
+    def _tick(self) -> None:
+        self._after_id = None
+        if not self.playing or self.recording is None:
+            return
+        steps = len(self.recording) // (REPLAY_DURATION * self.framerate)
+        self.seek(self.position + max(steps, 1))
+        if self.position >= len(self.recording):
+            self.playing = False
+            return
+        self._after_id = self.frame.after(1000 // self.framerate, self._tick)
+
+    def play(self) -> None:
+        if self.recording is None or self.playing:
+            return
+        if self.position >= len(self.recording):
+            self.seek(0)
+        self.playing = True
+        self._tick()
+
+    def pause(self) -> None:
+        self.playing = False
+        if self._after_id is not None:
+            self.frame.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _scale_moved(self, value: str) -> None:
+        # seek moves the scale too, which must not stop the playback
+        position = int(float(value))
+        if position == self.position:
+            return
+        self.pause()
+        self.seek(position)
+
+    def _record_changed(self, *_: Any) -> None:
+        PUBLISHER.queue_message("RecordChangeRequest", record=self.record_var.get())
+
+    def _setup(self) -> None:
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.columnconfigure(1, weight=1)
+        self.record_button.grid(column=0, row=0, columnspan=2, sticky="W")
+        self.play_button.grid(column=0, row=1, sticky="WE", pady=(10, 0))
+        self.pause_button.grid(column=1, row=1, sticky="WE", pady=(10, 0))
+        self.scale.grid(column=0, row=2, columnspan=2, sticky="WE", pady=(10, 0))
+        self.record_button.configure(variable=self.record_var)
+        self.play_button.configure(command=self.play)
+        self.pause_button.configure(command=self.pause)
+        self.scale.configure(command=self._scale_moved)
+        self.record_var.trace_add("write", self._record_changed)
+
+    def _setup_subscribers(self) -> None:
+        subscribers = [
+            Subscriber("MazeRecording", function=self.load),
+            Subscriber("MazeSolveRequest", function=self.clear),
+            Subscriber("ImageChangeRequest", function=self.clear),
+            Subscriber("ImageResetRequest", function=self.reset),
+            Subscriber("PointChangeRequest", function=self.clear),
+            Subscriber("MazeSolveStarted", function=self.solve_started),
+            Subscriber("MazeCancelRequest", function=self.solve_cancelled),
+            Subscriber("MazeSolveDone", function=self.solve_done),
+            Subscriber("MazeSolveCancelled", function=self.solve_done),
+            Subscriber("FramerateChangeRequest", function=self.set_framerate),
+        ]
+        for subscriber in subscribers:
+            PUBLISHER.register_subscriber(subscriber)
+
+
+class ControlArea(GuiElement):
+    def __init__(self, parent: Union[tk.Widget, tk.Tk], image: MazeImage) -> None:
         super().__init__(parent)
         self.image_control = ImageControl(self.frame)
         self.points_control = PointsControl(self.frame)
         self.solve_control = SolveControl(self.frame)
         self.save_control = SaveControl(self.frame)
         self.resolution_control = ResolutionControl(self.frame)
+        self.threshold_control = ThresholdControl(self.frame)
         self.framerate_control = FramerateControl(self.frame)
+        self.algorithm_control = AlgorithmControl(self.frame)
+        self.playback_control = PlaybackControl(self.frame, image)
 
     def _setup(self) -> None:
         self.frame.configure(padding=20)
@@ -259,15 +673,53 @@ class ControlArea(GuiElement):
         self.solve_control.grid(column=0, row=2, sticky="NWE", pady=(10, 10))
         self.save_control.grid(column=0, row=3, sticky="NWE", pady=(10, 10))
         self.resolution_control.grid(column=0, row=4, sticky="NWE", pady=(10, 10))
-        self.framerate_control.grid(column=0, row=5, sticky="NWE", pady=(0, 10))
+        self.threshold_control.grid(column=0, row=5, sticky="NWE", pady=(0, 10))
+        self.framerate_control.grid(column=0, row=6, sticky="NWE", pady=(0, 10))
+        self.algorithm_control.grid(column=0, row=7, sticky="NWE", pady=(10, 10))
+        self.playback_control.grid(column=0, row=8, sticky="NWE", pady=(10, 10))
+
+
+class MessagePump:
+    def __init__(self, root: Union[tk.Widget, tk.Tk]) -> None:
+        self.root = root
+        # Tk has no file handlers on Windows
+        self.event_driven = hasattr(root.tk, "createfilehandler")
+        self.interval = MIN_POLL_INTERVAL
+        self._watched: Set[int] = set()
+
+    def _watch(self) -> None:
+        for fd in set(PUBLISHER.wakeup_fds()) - self._watched:
+            self.root.tk.createfilehandler(fd, tk.READABLE, self._pump)
+            self._watched.add(fd)
+
+    def _pump(self, *_: Any) -> None:
+        PUBLISHER.send_messages()
+        # subscribers registered since the last pump are watched from now on
+        self._watch()
+
+    def _poll(self) -> None:
+        dispatched = PUBLISHER.send_messages()
+        # polling is fast while messages flow and backs off while idle
+        if dispatched:
+            self.interval = MIN_POLL_INTERVAL
+        else:
+            self.interval = min(self.interval * 2, MAX_POLL_INTERVAL)
+        self.root.after(self.interval, self._poll)
+
+    def start(self) -> None:
+        if self.event_driven:
+            self._pump()
+        else:
+            self._poll()
 
 
 class ApplicationGui:
     def __init__(self, image: MazeImage):
         self.root = tk.Tk()
         self.root.title("Maze Solver")
-        self.control_area = ControlArea(self.root)
+        self.control_area = ControlArea(self.root, image)
         self.image_area = ImageArea(self.root, image)
+        self.pump = MessagePump(self.root)
         self._setup()
 
     def _setup(self) -> None:
@@ -282,10 +734,6 @@ class ApplicationGui:
         with path as file:
             self.root.iconbitmap(file)
 
-    def _periodic_refresh(self) -> None:
-        PUBLISHER.send_messages()
-        self.root.after(1000 // 60, self._periodic_refresh)
-
     def start(self) -> None:
-        self._periodic_refresh()
+        self.pump.start()
         self.root.mainloop()
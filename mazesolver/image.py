@@ -1,24 +1,194 @@
-from typing import List, Optional, Tuple
+import json
+import os.path
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-import cv2
 import numpy as np
-from PIL import Image, ImageTk
 
-from mazesolver.config import DEFAULT_SCALE_RESOLUTION
-from mazesolver.types import Color, RegionOfInterest, Size
+from mazesolver.chaincode import ChainCode
+from mazesolver.config import (
+    DEFAULT_SCALE_RESOLUTION,
+    DEFAULT_THRESHOLD,
+    MAX_PIXEL_COST,
+    PRUNED_CACHE_SIZE,
+    SCALED_CACHE_SIZE,
+    SOURCE_CACHE_SIZE,
+)
+from mazesolver.index import (
+    IndexHeader,
+    MazeIndex,
+    get_index_path,
+    get_source_key,
+    restore,
+    share,
+)
+from mazesolver.lattice import Lattice, detect_lattice
+from mazesolver.lazy import LazyModule
+from mazesolver.pruning import fill_dead_ends
+from mazesolver.timer import Timer
+from mazesolver.types import Color, Point, RegionOfInterest, Size
+from mazesolver.viewport import Viewport
+
+if TYPE_CHECKING:
+    from PIL.ImageTk import PhotoImage
+
+# solver processes unpickle images without ever decoding or displaying them
+cv2 = LazyModule("cv2")
+Image = LazyModule("PIL.Image")
+ImageTk = LazyModule("PIL.ImageTk")
+
+CacheKey = Tuple[str, float, bool]
+
+
+def _block_sum(counts: np.ndarray, dtype: Any) -> np.ndarray:
+    height, width = counts.shape
+    padded = np.zeros((height + height % 2, width + width % 2), dtype=dtype)
+    padded[:height, :width] = counts
+    blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    return blocks.sum(axis=(1, 3), dtype=dtype)
+
+
+def _warp(pixels: np.ndarray, transform: np.ndarray, viewport: Viewport) -> np.ndarray:
+    # zoomed in pixels stay sharp squares
+    interpolation = cv2.INTER_NEAREST if viewport.zoom >= 1 else cv2.INTER_LINEAR
+    return cv2.warpAffine(
+        pixels,
+        transform,
+        viewport.size,
+        flags=interpolation | cv2.WARP_INVERSE_MAP,
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+
+
+class OverlayLayer:
+    def __init__(self, color: Color) -> None:
+        self.color = color
+        # 0 or 255 per pixel, allocated on the first paint
+        self.mask: Optional[np.ndarray] = None
+        # painted pixels per 2**k block for levels k >= 1, built on the first
+        # zoomed out render and then kept up to date by every paint
+        self.levels: List[np.ndarray] = []
+
+    @property
+    def nbytes(self) -> int:
+        levels = sum(level.nbytes for level in self.levels)
+        return levels + (0 if self.mask is None else self.mask.nbytes)
+
+    def _set(self, region: Any, value: int, update: np.ufunc) -> None:
+        assert self.mask is not None
+        if self.levels:
+            flat = np.unique(np.ravel_multi_index(region, self.mask.shape))
+            flat = flat[self.mask.ravel()[flat] != value]
+            rows, columns = np.divmod(flat, self.mask.shape[1])
+            for level, counts in enumerate(self.levels, start=1):
+                update.at(counts, (rows >> level, columns >> level), 1)
+        self.mask[region] = value
+
+    def paint(self, region: Any, shape: Tuple[int, int]) -> None:
+        if self.mask is None:
+            self.mask = np.zeros(shape, dtype=np.uint8)
+        self._set(region, 255, np.add)
+
+    def erase(self, region: Any) -> None:
+        if self.mask is not None:
+            self._set(region, 0, np.subtract)
+
+    def coverage(self, level: int, rows: slice, columns: slice) -> np.ndarray:
+        assert self.mask is not None
+        if level == 0:
+            return self.mask[rows, columns].astype(np.float32) / 255
+        while len(self.levels) < level:
+            counts = self.levels[-1] if self.levels else self.mask // 255
+            dtype = np.uint16 if 4 ** (len(self.levels) + 1) < 2**16 else np.uint32
+            self.levels.append(_block_sum(counts, dtype))
+        counts = self.levels[level - 1][rows, columns]
+        return counts.astype(np.float32) / 4**level
+
+    def clear(self) -> None:
+        self.mask = None
+        self.levels = []
 
 
 class MazeImage:
+    REDUCED_COLOR_FLAGS = {
+        1: "IMREAD_COLOR",
+        2: "IMREAD_REDUCED_COLOR_2",
+        4: "IMREAD_REDUCED_COLOR_4",
+        8: "IMREAD_REDUCED_COLOR_8",
+    }
+    REDUCED_GRAYSCALE_FLAGS = {
+        1: "IMREAD_GRAYSCALE",
+        2: "IMREAD_REDUCED_GRAYSCALE_2",
+        4: "IMREAD_REDUCED_GRAYSCALE_4",
+        8: "IMREAD_REDUCED_GRAYSCALE_8",
+    }
+
     def __init__(self) -> None:
         self.scaled_resolution = DEFAULT_SCALE_RESOLUTION
         self.pixels: np.ndarray = np.zeros(0)
-        self.bw_pixels: np.ndarray = np.zeros(0)
-        self.result: np.ndarray = np.zeros(0)
+        # open pixels, bit-packed along rows
+        self.passable: np.ndarray = np.zeros((0, 0), dtype=np.uint8)
+        self.shape: Tuple[int, int] = (0, 0)
+        self.layers: Dict[Color, OverlayLayer] = {}
         self.overlay: List[Tuple[RegionOfInterest, Color]] = []
+        self.solution_path: Optional[ChainCode] = None
+        self.solution_color = Color(0, 0, 255)
+        self.threshold = DEFAULT_THRESHOLD
+        # names the loaded maze, kept while only its walls are adjusted
+        self.maze_key = uuid.uuid4().hex
+        self.load_timings: Dict[str, float] = {}
         self.loaded = False
+        self.progress_callback: Optional[Callable[[str], None]] = None
+        self._cost_map: Optional[np.ndarray] = None
+        # 4-connected component of every open pixel, 0 on walls
+        self._labels: Optional[np.ndarray] = None
+        # detected on first use, None when the maze is not lattice aligned
+        self._lattice: Optional[Lattice] = None
+        self._lattice_checked = False
+        self._pruned: "OrderedDict[Tuple[Any, ...], Tuple[np.ndarray, int]]" = (
+            OrderedDict()
+        )
+        self._timer = Timer()
+        self._sources: "OrderedDict[CacheKey, Tuple[int, np.ndarray]]" = OrderedDict()
+        self._scaled: "OrderedDict[Tuple[Any, ...], np.ndarray]" = OrderedDict()
+        # the pixels halved again and again, levels[k] is 2**k times smaller
+        self._levels: List[np.ndarray] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # decoded sources and display buffers stay in the process that built them
+        state = self.__dict__.copy()
+        state["_sources"] = OrderedDict()
+        state["_scaled"] = OrderedDict()
+        state["_levels"] = []
+        return {name: share(value) for name, value in state.items()}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update({name: restore(value) for name, value in state.items()})
+
+    @property
+    def bw_pixels(self) -> np.ndarray:
+        # unpacked on every access, callers keep the grid for the duration
+        # of their work
+        return np.unpackbits(self.passable, axis=1, count=self.shape[1]).view(bool)
+
+    def _set_passable(self, bw_pixels: np.ndarray) -> None:
+        self.shape = (bw_pixels.shape[0], bw_pixels.shape[1])
+        self.passable = np.packbits(bw_pixels != 0, axis=1)
+        self._cost_map = None
+        self._labels = None
+        self._lattice, self._lattice_checked = None, False
+        self._pruned.clear()
+
+    def _measure(self, step: str) -> None:
+        self._timer.measure()
+        self.load_timings[step] = self._timer.elapsed_time
+        if self.progress_callback is not None:
+            self.progress_callback(step)
+        self._timer.start()
 
-    def _get_scaled_size(self) -> Size:
-        height, width, _ = self.pixels.shape
+    def _get_scaled_size(self, source_size: Size) -> Size:
+        width, height = source_size
         ratio = width / height
         if width > height:
             scaled_width = self.scaled_resolution
@@ -29,46 +199,369 @@ class MazeImage:
         size = Size(scaled_width, scaled_height)
         return size
 
-    def _load_pixels(self, image_path: str) -> None:
-        self.pixels = cv2.imread(image_path, cv2.IMREAD_COLOR)
-        self.pixels = cv2.cvtColor(self.pixels, cv2.COLOR_BGR2RGB)
-        scaled_size = self._get_scaled_size()
-        self.pixels = cv2.resize(self.pixels, scaled_size)
+    def _get_reduction(self, image_path: str) -> int:
+        try:
+            with Image.open(image_path) as image:
+                width, height = image.size
+        except OSError:
+            return 1
+        longest_side = max(width, height)
+        for factor in sorted(self.REDUCED_COLOR_FLAGS, reverse=True):
+            if longest_side // factor >= self.scaled_resolution:
+                return factor
+        return 1
+
+    def _get_cache_key(self, image_path: str, preview: bool) -> CacheKey:
+        path = os.path.abspath(image_path)
+        return (path, os.path.getmtime(path), preview)
+
+    def _decode(self, image_path: str, flag: int) -> np.ndarray:
+        pixels = cv2.imread(image_path, flag)
+        if pixels is None:
+            raise ValueError("Invalid Image")
+        self._measure("decode")
+        return pixels
+
+    def _get_source(self, image_path: str, key: CacheKey) -> np.ndarray:
+        reduction = self._get_reduction(image_path)
+        self._measure("header")
+        cached = self._sources.get(key)
+        # a source decoded at a finer reduction can serve any coarser request
+        if cached is not None and cached[0] <= reduction:
+            self._sources.move_to_end(key)
+            return cached[1]
+        preview = key[2]
+        flags = self.REDUCED_GRAYSCALE_FLAGS if preview else self.REDUCED_COLOR_FLAGS
+        source = self._decode(image_path, getattr(cv2, flags[reduction]))
+        self._store(self._sources, key, (reduction, source), SOURCE_CACHE_SIZE)
+        return source
+
+    def _store(
+        self, cache: "OrderedDict[Any, Any]", key: Any, value: Any, size: int
+    ) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+    def _resize(self, pixels: np.ndarray) -> np.ndarray:
+        height, width = pixels.shape[:2]
+        scaled_size = self._get_scaled_size(Size(width, height))
+        pixels = cv2.resize(pixels, scaled_size)
+        self._measure("resize")
+        return pixels
+
+    def _load_pixels(self, image_path: str, preview: bool) -> Optional[np.ndarray]:
+        key = self._get_cache_key(image_path, preview)
+        scaled_key = key + (self.scaled_resolution,)
+        pixels = self._scaled.get(scaled_key)
+        self._levels = []
+        if pixels is not None:
+            self._scaled.move_to_end(scaled_key)
+        else:
+            source = self._get_source(image_path, key)
+            pixels = self._resize(source)
+            if not preview:
+                pixels = cv2.cvtColor(pixels, cv2.COLOR_BGR2RGB)
+                self._measure("convert")
+            self._store(self._scaled, scaled_key, pixels, SCALED_CACHE_SIZE)
+        if not preview:
+            self.pixels = pixels
+            return None
+        # previews stay grayscale until thresholded, the color copy is only
+        # for display
+        self.pixels = cv2.cvtColor(pixels, cv2.COLOR_GRAY2RGB)
+        self._measure("convert")
+        return pixels
+
+    def _load_bw_pixels(self, grayscale: Optional[np.ndarray] = None) -> None:
+        if grayscale is None:
+            grayscale = cv2.cvtColor(self.pixels, cv2.COLOR_RGB2GRAY)
+        _, bw_pixels = cv2.threshold(grayscale, self.threshold, 255, cv2.THRESH_BINARY)
+        self._set_passable(bw_pixels)
+        self._measure("threshold")
 
-    def _load_bw_pixels(self) -> None:
-        bw_pixels = cv2.cvtColor(self.pixels, cv2.COLOR_RGB2GRAY)
-        _, bw_pixels = cv2.threshold(bw_pixels, 200, 255, cv2.THRESH_BINARY)
-        self.bw_pixels = bw_pixels
+    def _load_index(self, image_path: str) -> bool:
+        index = MazeIndex.open_for(image_path, self.scaled_resolution, self.threshold)
+        if index is None:
+            return False
+        self.pixels = index.sections["pixels"]
+        self._levels = []
+        self.shape = (self.pixels.shape[0], self.pixels.shape[1])
+        self.passable = index.sections["walls"]
+        self._cost_map = index.sections.get("costs", None)
+        self._labels = index.sections.get("labels", None)
+        self._lattice, self._lattice_checked = None, False
+        self._pruned.clear()
+        self._measure("index")
+        return True
 
-    def load_image(self, image_path: str) -> None:
+    def _write_index(self, image_path: str) -> None:
+        height, width = self.shape
+        header = IndexHeader(
+            width,
+            height,
+            self.scaled_resolution,
+            self.threshold,
+            *get_source_key(image_path),
+        )
+        arrays = {
+            "pixels": self.pixels,
+            "walls": self.passable,
+            "labels": self.get_labels(),
+            "costs": self.get_cost_map(),
+        }
+        try:
+            MazeIndex.write(get_index_path(image_path), header, arrays)
+        except OSError:
+            # a read-only directory only costs the next session a full load
+            return
+        self._measure("write index")
+
+    def load_image(self, image_path: str, preview: bool = False) -> None:
         if not image_path:
             return
+        self.load_timings = {}
+        self.maze_key = uuid.uuid4().hex
+        self._timer.start()
         try:
-            self._load_pixels(image_path)
-            self._load_bw_pixels()
-            self.result = np.copy(self.pixels)
-        except cv2.error as e:
+            if preview or not self._load_index(image_path):
+                grayscale = self._load_pixels(image_path, preview)
+                self._load_bw_pixels(grayscale)
+                if not preview:
+                    self._write_index(image_path)
+            self.reset_result()
+        except (cv2.error, OSError, ValueError) as e:
             self.loaded = False
             raise ValueError("Invalid Image") from e
         self.loaded = True
 
-    def apply_overlay(self) -> None:
+    def set_pixels(
+        self,
+        pixels: np.ndarray,
+        bw_pixels: np.ndarray,
+        packed: bool = False,
+        derived: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.pixels = pixels
+        self._levels = []
+        self.maze_key = uuid.uuid4().hex
+        if packed:
+            self.shape = (pixels.shape[0], pixels.shape[1])
+            self.passable = bw_pixels
+            self._cost_map = None
+            self._labels = None
+            self._lattice, self._lattice_checked = None, False
+            self._pruned.clear()
+        else:
+            self._set_passable(bw_pixels)
+        if derived is not None:
+            self._cost_map = derived.get("cost_map", None)
+            self._labels = derived.get("labels", None)
+        self.reset_result()
+        self.loaded = True
+
+    def set_threshold(self, threshold: int) -> None:
+        self.threshold = threshold
+        if not self.loaded:
+            return
+        self._timer.start()
+        self._load_bw_pixels()
+        self.reset_result()
+
+    def get_cost_map(self) -> np.ndarray:
+        # stepping next to a wall costs more than stepping in the middle of a
+        # corridor, walls cost 0 and are never entered
+        if self._cost_map is None:
+            bw_pixels = self.bw_pixels
+            distance = cv2.distanceTransform(bw_pixels.view(np.uint8), cv2.DIST_L2, 3)
+            cost = np.clip(MAX_PIXEL_COST - np.floor(distance), 1, MAX_PIXEL_COST)
+            cost[~bw_pixels] = 0
+            self._cost_map = cost.astype(np.uint8)
+        return self._cost_map
+
+    def get_labels(self) -> np.ndarray:
+        if self._labels is None:
+            _, self._labels = cv2.connectedComponents(
+                self.bw_pixels.view(np.uint8), connectivity=4, ltype=cv2.CV_32S
+            )
+        return self._labels
+
+    def get_lattice(self) -> Optional[Lattice]:
+        if not self._lattice_checked:
+            components = int(self.get_labels().max(initial=0))
+            self._lattice = detect_lattice(self.bw_pixels, components)
+            if self._lattice is not None:
+                # the cells are a maze of their own for the solver to search
+                cells = self._lattice.cells
+                self._lattice.image = MazeImage()
+                self._lattice.image.set_pixels(
+                    np.dstack([cells.view(np.uint8) * np.uint8(255)] * 3), cells
+                )
+                self._lattice.image.maze_key = f"{self.maze_key}/cells"
+            self._lattice_checked = True
+        return self._lattice
+
+    def get_derived(self) -> Dict[str, np.ndarray]:
+        derived = {"cost_map": self._cost_map, "labels": self._labels}
+        return {name: array for name, array in derived.items() if array is not None}
+
+    def reachable(self, start: Point, end: Point) -> bool:
+        if start == end:
+            return True
+        labels = self.get_labels()
+        target = labels[end.y, end.x]
+        if target == 0:
+            return False
+        # a start on a wall is left through any of its open neighbours
+        height, width = self.shape
+        neighbours = [(start.x, start.y)]
+        if labels[start.y, start.x] == 0:
+            neighbours = [
+                (x, y)
+                for x, y in [
+                    (start.x + 1, start.y),
+                    (start.x, start.y + 1),
+                    (start.x - 1, start.y),
+                    (start.x, start.y - 1),
+                ]
+                if 0 <= x < width and 0 <= y < height
+            ]
+        return any(labels[y, x] == target for x, y in neighbours)
+
+    def get_pruned(
+        self, start: Point, end: Point, cut_corners: bool = True
+    ) -> Tuple[np.ndarray, int]:
+        key = (Point(*start), Point(*end), cut_corners)
+        cached = self._pruned.get(key)
+        if cached is not None:
+            self._pruned.move_to_end(key)
+            packed, pruned = cached
+        else:
+            grid, pruned = fill_dead_ends(self.bw_pixels, key[:2], cut_corners)
+            packed = np.packbits(grid, axis=1)
+            self._store(self._pruned, key, (packed, pruned), PRUNED_CACHE_SIZE)
+        grid = np.unpackbits(packed, axis=1, count=self.shape[1]).view(bool)
+        return grid, pruned
+
+    def clear_cache(self) -> None:
+        self._sources.clear()
+        self._scaled.clear()
+        self._levels = []
+
+    def memory_usage(self) -> Dict[str, int]:
+        cost_map = 0 if self._cost_map is None else self._cost_map.nbytes
+        sources = sum(source.nbytes for _, source in self._sources.values())
+        scaled = sum(pixels.nbytes for pixels in self._scaled.values())
+        display = sum(level.nbytes for level in self._levels[1:])
+        return {
+            "pixels": self.pixels.nbytes,
+            "passable": self.passable.nbytes,
+            "pruned": sum(packed.nbytes for packed, _ in self._pruned.values()),
+            "cost_map": cost_map,
+            "labels": 0 if self._labels is None else self._labels.nbytes,
+            "layers": sum(layer.nbytes for layer in self.layers.values()),
+            "display": display,
+            "cache": sources + scaled,
+        }
+
+    def paint(self, region: Any, color: Color) -> None:
+        # the latest paint wins, so the region is taken from the other layers
+        for layer_color, layer in self.layers.items():
+            if layer_color != color:
+                layer.erase(region)
+        if color not in self.layers:
+            self.layers[color] = OverlayLayer(color)
+        self.layers[color].paint(region, self.shape)
+
+    def erase(self, region: Any) -> None:
+        for layer in self.layers.values():
+            layer.erase(region)
+
+    def _draw_markers(
+        self, pixels: np.ndarray, zoom: float = 1.0, left: float = 0, top: float = 0
+    ) -> None:
+        height, width = pixels.shape[:2]
         for area, color in self.overlay:
-            x1, y1, x2, y2 = area
-            self.result[y1:y2, x1:x2] = color
-
-    def get_tk_image(self, size: Optional[Size] = None) -> ImageTk.PhotoImage:
-        self.apply_overlay()
-        pixels = self.result
-        if size:
-            pixels = cv2.resize(pixels, size)
+            x1, x2 = int((area.x1 - left) * zoom), int((area.x2 - left) * zoom)
+            y1, y2 = int((area.y1 - top) * zoom), int((area.y2 - top) * zoom)
+            # markers stay at least one pixel wide once scaled down
+            x2, y2 = max(x2, x1 + 1), max(y2, y1 + 1)
+            if x2 <= 0 or y2 <= 0 or x1 >= width or y1 >= height:
+                continue
+            pixels[max(y1, 0) : y2, max(x1, 0) : x2] = color
+
+    def materialize(self) -> np.ndarray:
+        result = np.copy(self.pixels)
+        for layer in self.layers.values():
+            if layer.mask is not None:
+                result[layer.mask != 0] = layer.color
+        self._draw_markers(result)
+        return result
+
+    def _get_level(self, level: int) -> np.ndarray:
+        if not self._levels:
+            self._levels = [self.pixels]
+        while len(self._levels) <= level:
+            previous = self._levels[-1]
+            height, width = previous.shape[:2]
+            padded = cv2.copyMakeBorder(
+                previous, 0, height % 2, 0, width % 2, cv2.BORDER_REPLICATE
+            )
+            size = Size(padded.shape[1] // 2, padded.shape[0] // 2)
+            self._levels.append(cv2.resize(padded, size, interpolation=cv2.INTER_AREA))
+        return self._levels[level]
+
+    def render(self, viewport: Viewport) -> np.ndarray:
+        # only the visible window of the pyramid level matching the zoom is
+        # sampled, so the cost follows the view size and not the maze size,
+        # layers are blended by how much of each displayed pixel they cover
+        level = viewport.level
+        base = self._get_level(level)
+        rows, columns, transform = viewport.window(level, base.shape[:2])
+        pixels = _warp(base[rows, columns], transform, viewport).astype(np.float32)
+        for layer in self.layers.values():
+            if layer.mask is None:
+                continue
+            coverage = layer.coverage(level, rows, columns)
+            alpha = _warp(coverage, transform, viewport)[..., np.newaxis]
+            pixels += (np.array(layer.color, dtype=np.float32) - pixels) * alpha
+        result = pixels.astype(np.uint8)
+        self._draw_markers(result, viewport.zoom, viewport.left, viewport.top)
+        return result
+
+    def get_tk_image(self, viewport: Optional[Viewport] = None) -> "PhotoImage":
+        if viewport is not None:
+            pixels = self.render(viewport)
+        else:
+            pixels = self.materialize()
         image = Image.fromarray(pixels)
         tk_image = ImageTk.PhotoImage(image)
         return tk_image
 
     def save_result(self, image_path: str) -> None:
-        image = Image.fromarray(self.result)
+        image = Image.fromarray(self.materialize())
         image.save(image_path)
 
+    def set_solution_path(self, path: ChainCode, color: Color) -> None:
+        self.solution_path = path
+        self.solution_color = color
+        self.paint(path.region(), color)
+
+    def save_path(self, path_file: str) -> None:
+        if self.solution_path is None:
+            raise ValueError("No solution to save")
+        extension = os.path.splitext(path_file)[1].upper()
+        with open(path_file, "w") as file:
+            if extension == ".SVG":
+                height, width = self.shape
+                file.write(
+                    self.solution_path.to_svg(width, height, self.solution_color)
+                )
+            else:
+                json.dump(self.solution_path.to_json(), file)
+
     def reset_result(self) -> None:
-        self.result = np.copy(self.pixels)
+        for layer in self.layers.values():
+            layer.clear()
+        self.solution_path = None
@@ -0,0 +1,160 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from mazesolver.config import INDEX_EXTENSION
+
+MAGIC = b"MAZEIDX\0"
+VERSION = 1
+ALIGNMENT = 64
+# magic, version, section count, width, height, resolution, threshold,
+# source modification time and source size
+HEADER = struct.Struct("<8sHHIIIIdQ")
+# name, dtype, dimensions, shape, offset, size and crc32 of the data
+SECTION = struct.Struct("<8s4sB3x3IQQI")
+CHECKSUM = struct.Struct("<I")
+
+
+class IndexHeader(NamedTuple):
+    width: int
+    height: int
+    resolution: int
+    threshold: int
+    source_mtime: float
+    source_size: int
+
+
+class MappedArray(NamedTuple):
+    filename: str
+    offset: int
+    dtype: str
+    shape: Tuple[int, ...]
+
+    def open(self) -> np.ndarray:
+        return np.memmap(
+            self.filename, self.dtype, mode="r", offset=self.offset, shape=self.shape
+        )
+
+
+def share(value: Any) -> Any:
+    # arrays mapped straight from an index travel between processes as a
+    # reference and are mapped again on the other side instead of copied
+    if isinstance(value, np.memmap) and isinstance(value.base, mmap.mmap):
+        return MappedArray(value.filename, value.offset, value.dtype.str, value.shape)
+    return value
+
+
+def restore(value: Any) -> Any:
+    if isinstance(value, MappedArray):
+        return value.open()
+    return value
+
+
+def get_index_path(image_path: str) -> str:
+    return image_path + INDEX_EXTENSION
+
+
+def get_source_key(image_path: str) -> Tuple[float, int]:
+    status = os.stat(image_path)
+    return status.st_mtime, status.st_size
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class MazeIndex:
+    def __init__(
+        self, path: str, header: IndexHeader, sections: Dict[str, np.ndarray]
+    ) -> None:
+        self.path = path
+        self.header = header
+        self.sections = sections
+
+    @classmethod
+    def read(cls, path: str, verify: bool = True) -> "MazeIndex":
+        path = os.path.abspath(path)
+        with open(path, "rb") as file:
+            data = file.read(HEADER.size)
+            if len(data) < HEADER.size:
+                raise ValueError("Truncated index")
+            magic, version, count, *fields = HEADER.unpack(data)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Unsupported index")
+            table = file.read(count * SECTION.size + CHECKSUM.size)
+        if len(table) < count * SECTION.size + CHECKSUM.size:
+            raise ValueError("Truncated index")
+        (checksum,) = CHECKSUM.unpack(table[-CHECKSUM.size :])
+        if zlib.crc32(data + table[: -CHECKSUM.size]) != checksum:
+            raise ValueError("Corrupt index header")
+        file_size = os.path.getsize(path)
+        sections: Dict[str, np.ndarray] = {}
+        for number in range(count):
+            entry = SECTION.unpack_from(table, number * SECTION.size)
+            name, dtype, dimensions, *padded, offset, size, checksum = entry
+            dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+            shape = tuple(padded[:dimensions])
+            if offset + size > file_size or size != dtype.itemsize * np.prod(shape):
+                raise ValueError("Corrupt index section")
+            array = np.memmap(path, dtype, mode="r", offset=offset, shape=shape)
+            if verify and zlib.crc32(array.data) != checksum:
+                raise ValueError("Corrupt index section")
+            sections[name.rstrip(b"\0").decode("ascii")] = array
+        return cls(path, IndexHeader(*fields), sections)
+
+    @staticmethod
+    def write(path: str, header: IndexHeader, arrays: Dict[str, np.ndarray]) -> None:
+        contiguous = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+        offset = _align(HEADER.size + len(arrays) * SECTION.size + CHECKSUM.size)
+        table = HEADER.pack(MAGIC, VERSION, len(arrays), *header)
+        offsets = []
+        for name, array in contiguous.items():
+            shape = array.shape + (0,) * (3 - array.ndim)
+            table += SECTION.pack(
+                name.encode("ascii"),
+                array.dtype.str.encode("ascii"),
+                array.ndim,
+                *shape,
+                offset,
+                array.nbytes,
+                zlib.crc32(array.data),
+            )
+            offsets.append(offset)
+            offset = _align(offset + array.nbytes)
+        # readers never see a partly written index
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                file.write(table + CHECKSUM.pack(zlib.crc32(table)))
+                for offset, array in zip(offsets, contiguous.values()):
+                    file.seek(offset)
+                    file.write(array.data)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @classmethod
+    def open_for(
+        cls, image_path: str, resolution: int, threshold: int
+    ) -> Optional["MazeIndex"]:
+        # a missing, stale or damaged index is rebuilt by the caller
+        try:
+            index = cls.read(get_index_path(image_path))
+            source_mtime, source_size = get_source_key(image_path)
+        except (OSError, ValueError):
+            return None
+        header = index.header
+        if (
+            header.resolution != resolution
+            or header.threshold != threshold
+            or header.source_mtime != source_mtime
+            or header.source_size != source_size
+            or not {"pixels", "walls"} <= index.sections.keys()
+        ):
+            return None
+        return index
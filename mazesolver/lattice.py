@@ -0,0 +1,233 @@
+from collections import deque
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mazesolver.config import (
+    LATTICE_MAX_MISMATCH,
+    LATTICE_MIN_REDUCTION,
+    LATTICE_REGULARITY,
+)
+from mazesolver.lazy import LazyModule
+from mazesolver.types import Point
+
+if TYPE_CHECKING:
+    from mazesolver.image import MazeImage
+
+cv2 = LazyModule("cv2")
+
+
+def _get_bands(walls: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # a line through a band of walls crosses every post where walls meet,
+    # a line through a band of cells only the walls along it, so the share of
+    # wall pixels per line splits into two levels
+    profile = np.round(walls.mean(axis=0) * 255).astype(np.uint8)
+    _, kinds = cv2.threshold(
+        profile.reshape(1, -1), 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU
+    )
+    kinds = kinds.ravel()
+    starts = np.concatenate([[0], np.flatnonzero(kinds[1:] != kinds[:-1]) + 1])
+    return np.append(starts, kinds.size), kinds[starts].astype(bool)
+
+
+def _is_regular(edges: np.ndarray, walls: np.ndarray) -> bool:
+    # the bands at the border are margins of any width
+    widths, walls = np.diff(edges)[1:-1], walls[1:-1]
+    for kind in (True, False):
+        kind_widths = widths[walls == kind]
+        if kind_widths.size < 2:
+            return False
+        mode = np.bincount(kind_widths).argmax()
+        # scaled images round band edges to whole pixels
+        if np.mean(np.abs(kind_widths - mode) <= 1) < LATTICE_REGULARITY:
+            return False
+    return True
+
+
+def _get_pitch(edges: np.ndarray, walls: np.ndarray) -> Tuple[float, float]:
+    starts = edges[:-1][walls]
+    widths = np.diff(edges)[walls]
+    if starts.size < 2:
+        return 0.0, 0.0
+    pitch = (starts[-1] - starts[0]) / (starts.size - 1)
+    return float(pitch), float(np.mean(widths))
+
+
+class Lattice:
+    def __init__(
+        self,
+        row_edges: np.ndarray,
+        column_edges: np.ndarray,
+        cells: np.ndarray,
+        pitch: float = 0.0,
+        wall: float = 0.0,
+    ) -> None:
+        # band i covers the pixels from edges[i] up to edges[i + 1]
+        self.row_edges = row_edges
+        self.column_edges = column_edges
+        self.cells = cells
+        self.pitch = pitch
+        self.wall = wall
+        # the band of every pixel row and column
+        self.cell_rows = np.repeat(np.arange(row_edges.size - 1), np.diff(row_edges))
+        self.cell_columns = np.repeat(
+            np.arange(column_edges.size - 1), np.diff(column_edges)
+        )
+        self.image: Optional["MazeImage"] = None
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.cells.shape[0], self.cells.shape[1])
+
+    def expand_grid(self, grid: np.ndarray) -> np.ndarray:
+        return grid[self.cell_rows][:, self.cell_columns]
+
+    def expand(self, rows: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, ...]:
+        heights = np.diff(self.row_edges)[rows]
+        widths = np.diff(self.column_edges)[columns]
+        areas = heights * widths
+        cell = np.repeat(np.arange(areas.size), areas)
+        offsets = np.arange(cell.size) - np.repeat(np.cumsum(areas) - areas, areas)
+        pixel_rows = self.row_edges[rows][cell] + offsets // widths[cell]
+        pixel_columns = self.column_edges[columns][cell] + offsets % widths[cell]
+        return pixel_rows, pixel_columns
+
+    def to_cell(self, point: Point, open_pixel: bool = False) -> Point:
+        row, column = int(self.cell_rows[point.y]), int(self.cell_columns[point.x])
+        if self.cells[row, column] or not open_pixel:
+            return Point(column, row)
+        # an open pixel on the anti-aliased edge of a band of walls belongs to
+        # the open cell next to it
+        height, width = self.shape
+        nearest: Optional[Tuple[int, Point]] = None
+        for next_row, next_column in (
+            (row, column + 1),
+            (row + 1, column),
+            (row, column - 1),
+            (row - 1, column),
+        ):
+            if not (0 <= next_row < height and 0 <= next_column < width):
+                continue
+            if not self.cells[next_row, next_column]:
+                continue
+            top, left = self.row_edges[next_row], self.column_edges[next_column]
+            bottom = self.row_edges[next_row + 1] - 1
+            right = self.column_edges[next_column + 1] - 1
+            distance = max(top - point.y, point.y - bottom, 0) + max(
+                left - point.x, point.x - right, 0
+            )
+            if nearest is None or distance < nearest[0]:
+                nearest = (distance, Point(next_column, next_row))
+        return Point(column, row) if nearest is None else nearest[1]
+
+    def _walk(self, path: List[Point], row: int, column: int) -> None:
+        # straight runs between cell centers stay inside the two cells
+        last_row, last_column = path[-1]
+        step = 1 if column > last_column else -1
+        for next_column in range(last_column + step, column + step, step):
+            path.append(Point(last_row, next_column))
+        step = 1 if row > last_row else -1
+        for next_row in range(last_row + step, row + step, step):
+            path.append(Point(next_row, column))
+
+    def _walk_centers(
+        self,
+        path: Sequence[Tuple[int, int]],
+        start: Tuple[int, int],
+        end: Tuple[int, int],
+    ) -> List[Point]:
+        pixels = [Point(*start)]
+        for row, column in path:
+            center_row = (self.row_edges[row] + self.row_edges[row + 1] - 1) // 2
+            center_column = (
+                self.column_edges[column] + self.column_edges[column + 1] - 1
+            ) // 2
+            self._walk(pixels, int(center_row), int(center_column))
+        self._walk(pixels, *end)
+        return pixels
+
+    def to_pixels(
+        self,
+        path: Sequence[Tuple[int, int]],
+        start: Tuple[int, int],
+        end: Tuple[int, int],
+        passable: np.ndarray,
+    ) -> List[Point]:
+        # paths are (row, column) pairs, like the solver's, and the pixels are
+        # searched again but only inside the cells the path goes through, so
+        # the path is the shortest one they hold and never crosses a wall
+        chosen = np.zeros(self.shape, dtype=bool)
+        rows, columns = np.asarray(path, dtype=np.intp).reshape(-1, 2).T
+        chosen[rows, columns] = True
+        # the start and end may lie on the edge of a band of walls
+        for row, column in (start, end):
+            chosen[self.cell_rows[row], self.cell_columns[column]] = True
+        allowed = self.expand_grid(chosen) & (passable > 0)
+        allowed[start] = allowed[end] = True
+        width = allowed.shape[1]
+        inside = set(np.flatnonzero(allowed).tolist())
+        first = start[0] * width + start[1]
+        last = end[0] * width + end[1]
+        predecessors = {first: first}
+        queue = deque([first])
+        while queue:
+            pixel = queue.popleft()
+            if pixel == last:
+                break
+            column = pixel % width
+            for neighbour in (
+                pixel + 1 if column < width - 1 else -1,
+                pixel + width,
+                pixel - 1 if column > 0 else -1,
+                pixel - width,
+            ):
+                if neighbour in inside and neighbour not in predecessors:
+                    predecessors[neighbour] = pixel
+                    queue.append(neighbour)
+        # pixels the lattice rounded away may split the cells
+        if last not in predecessors:
+            return self._walk_centers(path, start, end)
+        pixels = [Point(*divmod(last, width))]
+        while last != first:
+            last = predecessors[last]
+            pixels.append(Point(*divmod(last, width)))
+        pixels.reverse()
+        return pixels
+
+
+def detect_lattice(bw_pixels: np.ndarray, components: int) -> Optional[Lattice]:
+    walls = ~bw_pixels
+    column_edges, column_walls = _get_bands(walls)
+    row_edges, row_walls = _get_bands(walls.T)
+    if not (
+        _is_regular(column_edges, column_walls) and _is_regular(row_edges, row_walls)
+    ):
+        return None
+    size = (row_edges.size - 1) * (column_edges.size - 1)
+    if size * LATTICE_MIN_REDUCTION > bw_pixels.size:
+        return None
+    # every cell takes the value of most of its pixels
+    counts = np.add.reduceat(
+        np.add.reduceat(bw_pixels.astype(np.int32), row_edges[:-1], axis=0),
+        column_edges[:-1],
+        axis=1,
+    )
+    cells = counts * 2 > np.outer(np.diff(row_edges), np.diff(column_edges))
+    row_pitch, row_wall = _get_pitch(row_edges, row_walls)
+    column_pitch, column_wall = _get_pitch(column_edges, column_walls)
+    lattice = Lattice(
+        row_edges,
+        column_edges,
+        cells,
+        (row_pitch + column_pitch) / 2,
+        (row_wall + column_wall) / 2,
+    )
+    # only the anti-aliased band edges may differ, a lattice that joins or
+    # splits corridors would solve a different maze
+    mismatch = np.count_nonzero(lattice.expand_grid(cells) != bw_pixels)
+    if mismatch > LATTICE_MAX_MISMATCH * bw_pixels.size:
+        return None
+    cell_components, _ = cv2.connectedComponents(cells.view(np.uint8), connectivity=4)
+    if cell_components - 1 != components:
+        return None
+    return lattice
@@ -0,0 +1,16 @@
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        # only reached for attributes of the wrapped module, which is
+        # imported on the first of them
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
@@ -0,0 +1,81 @@
+from queue import Empty, Full
+from typing import Any, Dict, Optional
+
+from mazesolver.image import MazeImage
+from mazesolver.pubsub import ThreadWorker
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class ImageLoader(ThreadWorker):
+    LOAD_STEPS = ["header", "decode", "resize", "convert", "threshold"]
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.image = MazeImage()
+        self.image.progress_callback = self._report_progress
+        self.generation = 0
+
+    def _send(self, kwargs: Dict[str, Any]) -> None:
+        try:
+            self.output_queue.put(kwargs, block=True, timeout=0.5)
+        except Full:
+            pass
+
+    def _report_progress(self, step: str) -> None:
+        # a newer request supersedes the one being loaded
+        if not self.input_queue.empty():
+            raise LoadCancelled()
+        if step not in self.LOAD_STEPS:
+            return
+        progress = (self.LOAD_STEPS.index(step) + 1) / len(self.LOAD_STEPS)
+        self._send(
+            {
+                "topic": "ImageLoadProgress",
+                "generation": self.generation,
+                "step": step,
+                "progress": progress,
+            }
+        )
+
+    def _latest_message(self) -> Optional[Dict[str, Any]]:
+        kwargs = None
+        self.received.clear()
+        while True:
+            try:
+                kwargs = self.input_queue.get_nowait()
+            except Empty:
+                break
+        return kwargs
+
+    def _load(self, kwargs: Dict[str, Any]) -> None:
+        self.generation = kwargs["generation"]
+        self.image.scaled_resolution = kwargs["resolution"]
+        self.image.threshold = kwargs["threshold"]
+        try:
+            self.image.load_image(kwargs["image_path"])
+        except LoadCancelled:
+            return
+        except ValueError:
+            self._send({"topic": "ImageLoadingError", "generation": self.generation})
+            return
+        self._send(
+            {
+                "topic": "ImageLoadDone",
+                "generation": self.generation,
+                "image_path": kwargs["image_path"],
+                "pixels": self.image.pixels,
+                "passable": self.image.passable,
+                "derived": self.image.get_derived(),
+                "timings": dict(self.image.load_timings),
+            }
+        )
+
+    def run(self) -> None:
+        while True:
+            self.received.wait()
+            kwargs = self._latest_message()
+            if kwargs is not None:
+                self._load(kwargs)
@@ -0,0 +1,70 @@
+import sys
+import threading
+import time
+from queue import Full
+from typing import List
+
+from mazesolver.pubsub import Publisher, ProcessWorker, ThreadWorker
+
+
+class LatencyProbe(ProcessWorker):
+    def __init__(self, interval: float) -> None:
+        super().__init__(output_size=1, daemon=True)
+        self.interval = interval
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            # perf_counter is a system wide monotonic clock, so the receiving
+            # process can subtract it from its own
+            try:
+                self.output_queue.put_nowait(
+                    {"topic": "PumpProbe", "sent": time.perf_counter()}
+                )
+            except Full:
+                pass
+
+
+class PumpMonitor(ThreadWorker):
+    def __init__(self, publisher: Publisher, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.publisher = publisher
+        self.interval = interval
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def record(self, sent: float) -> None:
+        with self._lock:
+            self._latencies.append(time.perf_counter() - sent)
+
+    def format(self, elapsed: float, cpu: float, pumps: int, dispatched: int) -> str:
+        with self._lock:
+            latencies, self._latencies = sorted(self._latencies), []
+        line = (
+            f"Pump: {pumps / elapsed:.1f} wakeups/s, "
+            f"{dispatched / elapsed:.1f} messages/s, CPU {cpu / elapsed:.1%}"
+        )
+        if latencies:
+            median = latencies[len(latencies) // 2]
+            line += (
+                f", latency median {median * 1000:.2f} ms, "
+                f"max {latencies[-1] * 1000:.2f} ms"
+            )
+        return line
+
+    def run(self) -> None:
+        wall, cpu = time.perf_counter(), time.process_time()
+        pumps, dispatched = self.publisher.pumps, self.publisher.dispatched
+        while True:
+            time.sleep(self.interval)
+            now_wall, now_cpu = time.perf_counter(), time.process_time()
+            now_pumps, now_dispatched = self.publisher.pumps, self.publisher.dispatched
+            line = self.format(
+                now_wall - wall,
+                now_cpu - cpu,
+                now_pumps - pumps,
+                now_dispatched - dispatched,
+            )
+            print(line, file=sys.stderr)
+            wall, cpu = now_wall, now_cpu
+            pumps, dispatched = now_pumps, now_dispatched
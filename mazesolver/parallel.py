@@ -0,0 +1,311 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+from multiprocessing.queues import Queue as ProcessQueue
+from queue import Empty
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from mazesolver.config import DEFAULT_SCALE_RESOLUTION, DEFAULT_WORKERS
+from mazesolver.image import MazeImage
+from mazesolver.state import ApplicationState
+from mazesolver.types import Point
+
+UNVISITED = -1
+
+
+class WorkerStats(NamedTuple):
+    tile: int
+    rows: Tuple[int, int]
+    busy_time: float
+    wait_time: float
+    expanded: int
+    rounds: int
+
+    @property
+    def utilization(self) -> float:
+        total = self.busy_time + self.wait_time
+        if total == 0:
+            return 0.0
+        return self.busy_time / total
+
+
+class TileWorker(mp.Process):
+    def __init__(
+        self,
+        index: int,
+        rows: Tuple[int, int],
+        shape: Tuple[int, int],
+        walls_name: str,
+        distance_name: str,
+        inboxes: List["ProcessQueue[Any]"],
+        barrier: Any,
+        frontier_sizes: Any,
+        found_flags: Any,
+        results: "ProcessQueue[Any]",
+        start: int,
+        end: int,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.index = index
+        self.rows = rows
+        self.shape = shape
+        self.walls_name = walls_name
+        self.distance_name = distance_name
+        self.inboxes = inboxes
+        self.barrier = barrier
+        self.frontier_sizes = frontier_sizes
+        self.found_flags = found_flags
+        self.results = results
+        self.start_pixel = start
+        self.end_pixel = end
+
+    def _neighbours(self, frontier: np.ndarray, width: int, size: int) -> np.ndarray:
+        columns = frontier % width
+        neighbours = np.concatenate(
+            (
+                frontier[columns < width - 1] + 1,
+                frontier[columns > 0] - 1,
+                frontier + width,
+                frontier - width,
+            )
+        )
+        return neighbours[(neighbours >= 0) & (neighbours < size)]
+
+    def _claim(
+        self, pixels: np.ndarray, walls: np.ndarray, distance: np.ndarray, level: int
+    ) -> np.ndarray:
+        pixels = np.unique(pixels)
+        pixels = pixels[(walls[pixels] != 0) & (distance[pixels] == UNVISITED)]
+        distance[pixels] = level
+        return pixels
+
+    def _exchange(self, up: np.ndarray, down: np.ndarray) -> List[np.ndarray]:
+        workers = len(self.inboxes)
+        received = []
+        if self.index > 0:
+            self.inboxes[self.index - 1].put(up)
+        if self.index < workers - 1:
+            self.inboxes[self.index + 1].put(down)
+        expected = int(self.index > 0) + int(self.index < workers - 1)
+        for _ in range(expected):
+            received.append(self.inboxes[self.index].get())
+        return received
+
+    def run(self) -> None:
+        height, width = self.shape
+        size = height * width
+        walls_memory = shared_memory.SharedMemory(name=self.walls_name)
+        distance_memory = shared_memory.SharedMemory(name=self.distance_name)
+        walls = np.ndarray((size,), dtype=np.uint8, buffer=walls_memory.buf)
+        distance = np.ndarray((size,), dtype=np.int32, buffer=distance_memory.buf)
+        workers = len(self.inboxes)
+        low, high = self.rows[0] * width, self.rows[1] * width
+        frontier = np.zeros(0, dtype=np.int64)
+        if low <= self.start_pixel < high:
+            frontier = np.array([self.start_pixel], dtype=np.int64)
+        busy_time = wait_time = 0.0
+        expanded = level = 0
+        while True:
+            began = time.perf_counter()
+            level += 1
+            expanded += frontier.size
+            neighbours = self._neighbours(frontier, width, size)
+            inside = (neighbours >= low) & (neighbours < high)
+            local = self._claim(neighbours[inside], walls, distance, level)
+            outside = neighbours[~inside]
+            up, down = outside[outside < low], outside[outside >= high]
+            waited = time.perf_counter()
+            received = self._exchange(up, down)
+            resumed = time.perf_counter()
+            claimed = [local]
+            for pixels in received:
+                claimed.append(self._claim(pixels, walls, distance, level))
+            frontier = np.concatenate(claimed)
+            found = low <= self.end_pixel < high and (
+                distance[self.end_pixel] != UNVISITED
+            )
+            parity = (level % 2) * workers
+            self.frontier_sizes[parity + self.index] = frontier.size
+            self.found_flags[parity + self.index] = int(found)
+            finished = time.perf_counter()
+            self.barrier.wait()
+            done = time.perf_counter()
+            busy_time += (waited - began) + (finished - resumed)
+            wait_time += (resumed - waited) + (done - finished)
+            sizes = self.frontier_sizes[parity : parity + workers]
+            flags = self.found_flags[parity : parity + workers]
+            if any(flags) or not any(sizes):
+                break
+        del walls, distance
+        walls_memory.close()
+        distance_memory.close()
+        self.results.put(
+            WorkerStats(self.index, self.rows, busy_time, wait_time, expanded, level)
+        )
+
+
+class ParallelSolver:
+    RESULT_TIMEOUT = 0.5
+
+    def __init__(self, workers: int = DEFAULT_WORKERS) -> None:
+        self.workers = max(1, workers)
+        self.stats: List[WorkerStats] = []
+        self.elapsed_time: float = 0
+
+    @property
+    def utilization(self) -> List[float]:
+        return [stats.utilization for stats in self.stats]
+
+    def _split_rows(self, height: int) -> List[Tuple[int, int]]:
+        tiles = min(self.workers, height)
+        bounds = np.linspace(0, height, tiles + 1).astype(int)
+        return [(int(bounds[i]), int(bounds[i + 1])) for i in range(tiles)]
+
+    def _trace_path(
+        self, distance: np.ndarray, start: Point, end: Point
+    ) -> List[Point]:
+        height, width = distance.shape
+        path = [end]
+        y, x = end
+        while (y, x) != tuple(start):
+            level = distance[y, x] - 1
+            for next_y, next_x in ((y, x + 1), (y + 1, x), (y, x - 1), (y - 1, x)):
+                if (
+                    0 <= next_y < height
+                    and 0 <= next_x < width
+                    and distance[next_y, next_x] == level
+                ):
+                    y, x = next_y, next_x
+                    break
+            path.append(Point(y, x))
+        path.reverse()
+        return path
+
+    def _collect(
+        self, results: "ProcessQueue[Any]", workers: List[TileWorker]
+    ) -> List[WorkerStats]:
+        stats: List[WorkerStats] = []
+        while len(stats) < len(workers):
+            try:
+                stats.append(results.get(timeout=self.RESULT_TIMEOUT))
+            except Empty:
+                # the other tiles would wait for a dead one at the barrier
+                # forever
+                dead = [
+                    worker for worker in workers if worker.exitcode not in (None, 0)
+                ]
+                if dead:
+                    for worker in workers:
+                        if worker.is_alive():
+                            worker.terminate()
+                    raise RuntimeError(
+                        f"Tile worker {dead[0].index} exited with {dead[0].exitcode}"
+                    )
+        return stats
+
+    def _run_workers(
+        self, walls: np.ndarray, distance: np.ndarray, start: int, end: int
+    ) -> None:
+        height, width = walls.shape
+        walls_memory = shared_memory.SharedMemory(create=True, size=walls.nbytes)
+        distance_memory = shared_memory.SharedMemory(create=True, size=distance.nbytes)
+        try:
+            np.ndarray(walls.shape, dtype=np.uint8, buffer=walls_memory.buf)[:] = walls
+            shared_distance = np.ndarray(
+                distance.shape, dtype=np.int32, buffer=distance_memory.buf
+            )
+            shared_distance[:] = distance
+            tiles = self._split_rows(height)
+            inboxes: List["ProcessQueue[Any]"] = [mp.Queue() for _ in tiles]
+            barrier = mp.Barrier(len(tiles))
+            frontier_sizes = mp.Array("q", 2 * len(tiles), lock=False)
+            found_flags = mp.Array("b", 2 * len(tiles), lock=False)
+            results: "ProcessQueue[Any]" = mp.Queue()
+            workers = [
+                TileWorker(
+                    index,
+                    rows,
+                    (height, width),
+                    walls_memory.name,
+                    distance_memory.name,
+                    inboxes,
+                    barrier,
+                    frontier_sizes,
+                    found_flags,
+                    results,
+                    start,
+                    end,
+                )
+                for index, rows in enumerate(tiles)
+            ]
+            for worker in workers:
+                worker.start()
+            stats = self._collect(results, workers)
+            for worker in workers:
+                worker.join()
+            self.stats = sorted(stats, key=lambda worker_stats: worker_stats.tile)
+            distance[:] = shared_distance
+            del shared_distance
+        finally:
+            walls_memory.close()
+            walls_memory.unlink()
+            distance_memory.close()
+            distance_memory.unlink()
+
+    def solve(self, state: ApplicationState) -> Optional[List[Point]]:
+        # points are inverted to (y, x), matching the sequential Solver
+        start = Point(*state.start_point[::-1])
+        end = Point(*state.end_point[::-1])
+        walls = np.ascontiguousarray(state.image.bw_pixels, dtype=np.uint8)
+        distance = np.full(walls.shape, UNVISITED, dtype=np.int32)
+        began = time.perf_counter()
+        self.stats = []
+        if start == end:
+            self.elapsed_time = time.perf_counter() - began
+            return [start]
+        distance[start] = 0
+        width = walls.shape[1]
+        self._run_workers(
+            walls, distance, start[0] * width + start[1], end[0] * width + end[1]
+        )
+        self.elapsed_time = time.perf_counter() - began
+        if distance[end] == UNVISITED:
+            return None
+        return self._trace_path(distance, start, end)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m mazesolver parallel")
+    parser.add_argument("image_path")
+    parser.add_argument("--start", type=int, nargs=2, required=True, metavar=("X", "Y"))
+    parser.add_argument("--end", type=int, nargs=2, required=True, metavar=("X", "Y"))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--resolution", type=int, default=DEFAULT_SCALE_RESOLUTION)
+    args = parser.parse_args(argv)
+    image = MazeImage()
+    image.scaled_resolution = args.resolution
+    try:
+        image.load_image(args.image_path)
+    except ValueError:
+        parser.error(f"cannot load {args.image_path}")
+    height, width = image.shape
+    for x, y in (args.start, args.end):
+        if not (0 <= x < width and 0 <= y < height):
+            parser.error(f"point {x} {y} outside the {width}x{height} maze")
+    state = ApplicationState(
+        image, start_point=Point(*args.start), end_point=Point(*args.end)
+    )
+    solver = ParallelSolver(args.workers)
+    path = solver.solve(state)
+    length = "no path" if path is None else f"length {len(path)}"
+    print(f"{length} in {solver.elapsed_time:.3f}s on {len(solver.stats)} tiles")
+    for stats in solver.stats:
+        first, last = stats.rows
+        print(
+            f"  tile {stats.tile}: rows {first}-{last - 1}, "
+            f"{stats.utilization:.0%} busy, {stats.expanded} expanded, "
+            f"{stats.rounds} rounds"
+        )
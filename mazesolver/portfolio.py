@@ -0,0 +1,145 @@
+import json
+import os
+from dataclasses import replace
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from mazesolver.config import PORTFOLIO_STATS_PATH, PORTFOLIOS
+from mazesolver.image import MazeImage
+from mazesolver.lazy import LazyModule
+from mazesolver.state import ApplicationState
+
+cv2 = LazyModule("cv2")
+
+Results = Dict[str, Optional[Dict[str, Any]]]
+
+
+def get_label(algorithm: str, prune: bool) -> str:
+    return f"{algorithm} pruned" if prune else algorithm
+
+
+def get_entries(state: ApplicationState) -> Dict[str, Dict[str, Any]]:
+    entries = {}
+    for algorithm, prune in PORTFOLIOS[state.algorithm]:
+        # a race measures speed, so no strategy is held back by the animation
+        member = replace(
+            state,
+            algorithm=algorithm,
+            prune=prune,
+            max_throughput=True,
+            replan=False,
+        )
+        entries[get_label(algorithm, prune)] = {"start": True, "state": member}
+    return entries
+
+
+class MazeClassifier:
+    ROOM_DISTANCE = 3
+    ROOMS = 0.5
+    CORRIDORS = 0.1
+
+    def classify(self, image: MazeImage) -> str:
+        # the share of open pixels at least ROOM_DISTANCE away from any wall
+        # tells open rooms from twisty corridors
+        bw_pixels = image.bw_pixels.view(np.uint8)
+        open_pixels = np.count_nonzero(bw_pixels)
+        if not open_pixels:
+            return "empty"
+        distance = cv2.distanceTransform(bw_pixels, cv2.DIST_L1, 3)
+        rooms = np.count_nonzero(distance >= self.ROOM_DISTANCE) / open_pixels
+        if rooms >= self.ROOMS:
+            return "rooms"
+        if rooms <= self.CORRIDORS:
+            return "corridors"
+        return "mixed"
+
+
+class PortfolioStats:
+    def __init__(self, path: str = PORTFOLIO_STATS_PATH) -> None:
+        self.path = path
+        self.classifier = MazeClassifier()
+        self.maze_types: Dict[int, str] = {}
+        # maze type to strategy to race and win counts and total winning time
+        self.stats: Dict[str, Dict[str, Dict[str, float]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        try:
+            with open(self.path) as file:
+                stats = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return stats if isinstance(stats, dict) else {}
+
+    def _save(self) -> None:
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temporary, "w") as file:
+                json.dump(self.stats, file, indent=2)
+            os.replace(temporary, self.path)
+        except OSError:
+            return
+
+    def start(self, job: int, image: MazeImage) -> str:
+        maze_type = self.classifier.classify(image)
+        self.maze_types[job] = maze_type
+        return maze_type
+
+    def best(self, maze_type: str) -> Optional[str]:
+        strategies = self.stats.get(maze_type, {})
+        if not strategies:
+            return None
+        return max(strategies, key=lambda label: strategies[label]["wins"])
+
+    def record(
+        self,
+        job: int,
+        winner: Optional[str],
+        elapsed: Dict[str, Optional[float]],
+        results: Results,
+    ) -> Optional[str]:
+        maze_type = self.maze_types.pop(job, None)
+        # a race cancelled before anyone won says nothing about the strategies
+        if maze_type is None or winner is None:
+            return None
+        strategies = self.stats.setdefault(maze_type, {})
+        for label in elapsed:
+            counts = strategies.setdefault(
+                label, {"races": 0, "wins": 0, "win_time": 0.0}
+            )
+            counts["races"] += 1
+        strategies[winner]["wins"] += 1
+        strategies[winner]["win_time"] += elapsed[winner] or 0.0
+        self._save()
+        return self.format(maze_type, winner, elapsed, results)
+
+    def format(
+        self,
+        maze_type: str,
+        winner: str,
+        elapsed: Dict[str, Optional[float]],
+        results: Results,
+    ) -> str:
+        visited = self._visited(results[winner])
+        others = []
+        for label, result in results.items():
+            if label == winner:
+                continue
+            if result is None:
+                others.append(f"{label} never started")
+            else:
+                others.append(f"{label} had {self._visited(result)}")
+        best = self.best(maze_type)
+        counts = self.stats[maze_type][best or winner]
+        return (
+            f"{winner} won on {maze_type} in {elapsed[winner] or 0:.3f} s "
+            f"after {visited} pixels ({', '.join(others)}); "
+            f"best on {maze_type}: {best} "
+            f"({counts['wins']:.0f} of {counts['races']:.0f})"
+        )
+
+    def _visited(self, result: Optional[Dict[str, Any]]) -> int:
+        if result is None:
+            return 0
+        return int(result.get("stats", {}).get("visited", 0))
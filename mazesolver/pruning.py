@@ -0,0 +1,73 @@
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from mazesolver.types import Point
+
+# neighbourhood bits, row by row around the center pixel
+UP_LEFT, UP, UP_RIGHT, LEFT, RIGHT, DOWN_LEFT, DOWN, DOWN_RIGHT = (
+    1 << bit for bit in range(8)
+)
+
+
+def _is_removable(code: int, cut_corners: bool) -> bool:
+    sides = sum(code & side != 0 for side in (UP, LEFT, RIGHT, DOWN))
+    if sides <= 1:
+        # a dead end can only be the last pixel of a path
+        return True
+    if sides > 2 or not cut_corners:
+        return False
+    # a corner whose diagonal is open can be cut through the diagonal
+    # without making any path longer in steps, though not in weighted cost
+    corners = [
+        (UP | LEFT, UP_LEFT),
+        (UP | RIGHT, UP_RIGHT),
+        (DOWN | LEFT, DOWN_LEFT),
+        (DOWN | RIGHT, DOWN_RIGHT),
+    ]
+    return any(code & pair == pair and code & diagonal for pair, diagonal in corners)
+
+
+REMOVABLE = {
+    cut_corners: np.array([_is_removable(code, cut_corners) for code in range(256)])
+    for cut_corners in (False, True)
+}
+
+
+def fill_dead_ends(
+    bw_pixels: np.ndarray, keep: Iterable[Point], cut_corners: bool = True
+) -> Tuple[np.ndarray, int]:
+    height, width = bw_pixels.shape
+    # a border of walls keeps every neighbour index inside the grid
+    grid = np.zeros((height + 2, width + 2), dtype=np.uint8)
+    grid[1:-1, 1:-1] = bw_pixels != 0
+    kept = np.zeros(grid.shape, dtype=bool)
+    for x, y in keep:
+        if 0 <= x < width and 0 <= y < height:
+            kept[y + 1, x + 1] = True
+    grid, kept = grid.ravel(), kept.ravel()
+    padded_width = width + 2
+    neighbours = np.array(
+        [dy * padded_width + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+    )
+    weights = np.array([1 << bit for bit in range(8)], dtype=np.int32)
+    candidates = np.flatnonzero(grid)
+    pruned = 0
+    while candidates.size:
+        # pixels that share a 3x3 neighbourhood are never removed together,
+        # so each phase behaves as if its pixels were removed one by one
+        phases = (candidates // padded_width % 2) * 2 + candidates % 2
+        removed = []
+        for phase in range(4):
+            pixels = candidates[phases == phase]
+            pixels = pixels[(grid[pixels] != 0) & ~kept[pixels]]
+            codes = grid[pixels[:, np.newaxis] + neighbours] @ weights
+            pixels = pixels[REMOVABLE[cut_corners][codes]]
+            grid[pixels] = 0
+            removed.append(pixels)
+        changed = np.concatenate(removed)
+        pruned += changed.size
+        candidates = np.unique((changed[:, np.newaxis] + neighbours).ravel())
+        candidates = candidates[grid[candidates] != 0]
+    grid = grid.reshape(height + 2, width + 2)[1:-1, 1:-1]
+    return grid.astype(bool), pruned
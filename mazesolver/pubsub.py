@@ -1,7 +1,20 @@
 import multiprocessing as mp
+import socket
 import threading
+import time
+from multiprocessing import forkserver
 from queue import Empty, Full, Queue
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 
 class Subscriber:
@@ -13,15 +26,58 @@ class Subscriber:
         self.function(**kwargs)
 
 
+class Wakeup:
+    def __init__(self) -> None:
+        # a socket pair rather than a pipe, since it can be made non-blocking
+        # on every platform
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self._pending = False
+
+    def fileno(self) -> int:
+        return self._reader.fileno()
+
+    def set(self) -> None:
+        # producers publish their data before setting, and the consumer clears
+        # before reading it, so no wakeup is lost and bursts write one byte
+        if self._pending:
+            return
+        self._pending = True
+        try:
+            self._writer.send(b"\0")
+        except BlockingIOError:
+            pass
+
+    def clear(self) -> None:
+        self._pending = False
+        try:
+            while self._reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class WakeupQueue(Queue):  # type: ignore[type-arg]
+    def __init__(self, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self.wakeup: Optional[Wakeup] = None
+
+    def _put(self, item: Any) -> None:
+        super()._put(item)
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+
 class ThreadWorker(threading.Thread):
     def __init__(
         self, *args: Any, input_size: int = 0, output_size: int = 0, **kwargs: Any
     ) -> None:
         super().__init__(*args, **kwargs)
-        self.input_queue: "Queue[Any]" = mp.Queue(input_size)
-        self.output_queue: "Queue[Any]" = mp.Queue(output_size)
-        self.received = mp.Event()
-        self.response = mp.Event()
+        self.input_queue: "Queue[Any]" = Queue(input_size)
+        self.output_queue: "WakeupQueue" = WakeupQueue(output_size)
+        self.received = threading.Event()
+        self.response = threading.Event()
 
     def clear_queue(self) -> None:
         while True:
@@ -38,12 +94,13 @@ class ThreadSubscriber:
         self.worker = worker
         self.worker.start()
 
-    def queue_message_no_wait(self, kwargs: Dict[str, Any]) -> None:
+    def queue_message_no_wait(self, kwargs: Dict[str, Any]) -> bool:
         try:
             self.worker.input_queue.put_nowait(kwargs)
         except Full:
-            return
+            return False
         self.worker.received.set()
+        return True
 
     def queue_message_wait(
         self, message_timeout: float, response_timeout: float, kwargs: Dict[str, Any]
@@ -53,11 +110,60 @@ class ThreadSubscriber:
             self.worker.input_queue.put(kwargs, block=True, timeout=message_timeout)
         except Full:
             return False
+        # the worker may have drained the queue while this waited for room
+        self.worker.received.set()
         response = self.worker.response.wait(timeout=response_timeout)
         self.worker.response.clear()
         return response
 
 
+class ControlBlock:
+    RUN = 0
+    STOP = 1
+    CANCEL = 2
+    IDLE = 0
+    RUNNING = 1
+    STOPPED = 2
+    POLL_INTERVAL = 0.0001
+
+    def __init__(self) -> None:
+        # word 0 packs the target job, a generation and the command, so one
+        # aligned 64-bit store publishes all three; word 1 is the last
+        # generation the worker acknowledged and word 2 the worker state
+        self._words = mp.RawArray("q", 3)
+
+    @property
+    def state(self) -> int:
+        return self._words[2]
+
+    @state.setter
+    def state(self, state: int) -> None:
+        self._words[2] = state
+
+    def read(self) -> Tuple[int, int, int]:
+        word = self._words[0]
+        return word >> 33, (word >> 2) & 0x7FFFFFFF, word & 0x3
+
+    def pending(self, generation: int) -> bool:
+        return (self._words[0] >> 2) & 0x7FFFFFFF != generation
+
+    def send(self, job: int, command: int) -> int:
+        generation = ((self._words[0] >> 2) + 1) & 0x7FFFFFFF
+        self._words[0] = (job << 33) | (generation << 2) | command
+        return generation
+
+    def acknowledge(self, generation: int) -> None:
+        self._words[1] = generation
+
+    def wait_acknowledged(self, generation: int, timeout: float) -> bool:
+        deadline = time.perf_counter() + timeout
+        while self._words[1] != generation:
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+
 class ProcessWorker(mp.Process):
     def __init__(
         self, *args: Any, input_size: int = 0, output_size: int = 0, **kwargs: Any
@@ -67,6 +173,7 @@ class ProcessWorker(mp.Process):
         self.output_queue: "Queue[Any]" = mp.Queue(output_size)
         self.received = mp.Event()
         self.response = mp.Event()
+        self.control = ControlBlock()
 
     def clear_queue(self) -> None:
         while True:
@@ -102,6 +209,246 @@ class ProcessSubscriber:
         self.worker.response.clear()
         return response
 
+    def send_command(
+        self, job: int, command: int, wait_for_response: bool, timeout: float
+    ) -> bool:
+        generation = self.worker.control.send(job, command)
+        # a running worker sees the command on its next poll, only a stopped
+        # one is blocked and needs waking, while an idle one either takes it
+        # when the job starts or has finished the job and leaves it unanswered
+        # until the next one, so waiting on it can time out
+        if self.worker.control.state == ControlBlock.STOPPED:
+            self.worker.received.set()
+        if wait_for_response:
+            return self.worker.control.wait_acknowledged(generation, timeout)
+        return True
+
+
+class Race:
+    def __init__(self, job: int, members: Dict[int, str]) -> None:
+        self.job = job
+        # member job to the label of its strategy
+        self.members = members
+        self.started = time.perf_counter()
+        self.buffered: Dict[int, List[Dict[str, Any]]] = {job: [] for job in members}
+        self.elapsed: Dict[str, Optional[float]] = {}
+        self.results: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.winner: Optional[int] = None
+
+    def finished(self, member: int) -> bool:
+        return self.members[member] in self.results
+
+
+class ProcessPoolSubscriber:
+    def __init__(
+        self,
+        name: str,
+        worker_factory: Callable[[], ProcessWorker],
+        size: int,
+        done_topics: Iterable[str],
+        win_topics: Iterable[str] = (),
+    ):
+        self.name = name
+        self.done_topics = set(done_topics)
+        self.win_topics = set(win_topics)
+        self.subscribers = [
+            ProcessSubscriber(f"{name}-{index}", worker=worker_factory())
+            for index in range(max(1, size))
+        ]
+        self.idle: List[ProcessSubscriber] = list(self.subscribers)
+        self.running: Dict[int, ProcessSubscriber] = {}
+        self.pending: List[Tuple[int, Dict[str, Any]]] = []
+        self.races: Dict[int, Race] = {}
+        self._race_of: Dict[int, int] = {}
+        self._outbox: List[Dict[str, Any]] = []
+        self._next_job = 0
+        # pending jobs that would rather run where the same affinity ran last,
+        # and the worker that did
+        self._affinity: Dict[int, Hashable] = {}
+        self._holders: Dict[Hashable, ProcessSubscriber] = {}
+
+    def _take_idle(self, affinity: Optional[Hashable]) -> ProcessSubscriber:
+        subscriber = self._holders.get(affinity, None) if affinity is not None else None
+        # a busy worker is not waited for, the job just cannot reuse its state
+        if subscriber is None or subscriber not in self.idle:
+            subscriber = self.idle[0]
+        self.idle.remove(subscriber)
+        if affinity is not None:
+            # a worker keeps the state of its last affinity only
+            for key, holder in list(self._holders.items()):
+                if holder is subscriber:
+                    del self._holders[key]
+            self._holders[affinity] = subscriber
+        return subscriber
+
+    def _dispatch(self) -> None:
+        while self.idle and self.pending:
+            job, kwargs = self.pending.pop(0)
+            subscriber = self._take_idle(self._affinity.pop(job, None))
+            self.running[job] = subscriber
+            subscriber.queue_message_no_wait(kwargs)
+
+    def submit(
+        self, kwargs: Dict[str, Any], affinity: Optional[Hashable] = None
+    ) -> int:
+        self._next_job += 1
+        job = self._next_job
+        self.pending.append((job, dict(kwargs, job=job)))
+        if affinity is not None:
+            self._affinity[job] = affinity
+        self._dispatch()
+        return job
+
+    def race(self, entries: Dict[str, Dict[str, Any]]) -> int:
+        # every entry runs as its own job, the race is seen from outside as a
+        # single job whose messages are those of the first member to win
+        self._next_job += 1
+        job = self._next_job
+        members = {}
+        for label, kwargs in entries.items():
+            member = self.submit(kwargs)
+            members[member] = label
+            self._race_of[member] = job
+        self.races[job] = Race(job, members)
+        return job
+
+    def queue_message_no_wait(self, job: int, kwargs: Dict[str, Any]) -> bool:
+        subscriber = self.running.get(job, None)
+        if subscriber is None:
+            return False
+        subscriber.queue_message_no_wait(dict(kwargs, job=job))
+        return True
+
+    def control(
+        self,
+        job: int,
+        command: int,
+        wait_for_response: bool = False,
+        timeout: float = 1,
+    ) -> bool:
+        race = self.races.get(job, None)
+        if race is not None:
+            members = [member for member in race.members if not race.finished(member)]
+            results = [
+                self.control(member, command, wait_for_response, timeout)
+                for member in members
+            ]
+            return bool(results) and all(results)
+        subscriber = self.running.get(job, None)
+        if subscriber is None:
+            return False
+        return subscriber.send_command(job, command, wait_for_response, timeout)
+
+    def cancel(
+        self, job: int, wait_for_response: bool = False, timeout: float = 1
+    ) -> bool:
+        race = self.races.get(job, None)
+        if race is not None:
+            members = [member for member in race.members if not race.finished(member)]
+            results = [
+                self.cancel(member, wait_for_response, timeout) for member in members
+            ]
+            return bool(results) and all(results)
+        for index, (pending_job, _) in enumerate(self.pending):
+            if pending_job == job:
+                del self.pending[index]
+                self._affinity.pop(job, None)
+                # a member that never started still has to finish its race
+                race_job = self._race_of.get(job, None)
+                if race_job is not None:
+                    race = self.races[race_job]
+                    self._outbox += self._finish_member(race, job, None)
+                return True
+        return self.control(job, ControlBlock.CANCEL, wait_for_response, timeout)
+
+    def _finish(self, job: Optional[int]) -> None:
+        subscriber = self.running.pop(job, None) if job is not None else None
+        if subscriber is not None:
+            self.idle.append(subscriber)
+        self._dispatch()
+
+    def _finish_member(
+        self, race: Race, member: int, kwargs: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        label = race.members[member]
+        race.results[label] = kwargs
+        race.elapsed[label] = None
+        if kwargs is not None:
+            race.elapsed[label] = time.perf_counter() - race.started
+        del self._race_of[member]
+        messages: List[Dict[str, Any]] = []
+        if (
+            race.winner is None
+            and kwargs is not None
+            and kwargs["topic"] in self.win_topics
+        ):
+            # the first result is final, the others are abandoned and nothing
+            # they send is passed on
+            race.winner = member
+            messages = race.buffered[member]
+            for other in race.members:
+                if not race.finished(other):
+                    self.cancel(other)
+        # cancelling a member that never started may have ended the race
+        if race.job not in self.races or len(race.results) < len(race.members):
+            return [dict(message, job=race.job) for message in messages]
+        del self.races[race.job]
+        # without a winner the last member to stop speaks for the race
+        if race.winner is None:
+            messages = race.buffered[member]
+        messages = [dict(message, job=race.job) for message in messages]
+        winner = None if race.winner is None else race.members[race.winner]
+        messages.append(
+            {
+                "topic": "RaceDone",
+                "job": race.job,
+                "winner": winner,
+                "elapsed": race.elapsed,
+                "results": race.results,
+            }
+        )
+        return messages
+
+    def _race_message(self, race: Race, kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        member = kwargs["job"]
+        if race.winner is None:
+            race.buffered[member].append(kwargs)
+        if kwargs["topic"] not in self.done_topics:
+            return []
+        return self._finish_member(race, member, kwargs)
+
+    def fetch_messages(self) -> List[Dict[str, Any]]:
+        messages, self._outbox = self._outbox, []
+        for subscriber in self.subscribers:
+            while True:
+                try:
+                    kwargs = subscriber.worker.output_queue.get_nowait()
+                except Empty:
+                    break
+                job = kwargs.get("job", None)
+                if kwargs["topic"] in self.done_topics:
+                    self._finish(job)
+                race_job = self._race_of.get(job, None) if job is not None else None
+                if race_job is not None:
+                    messages += self._race_message(self.races[race_job], kwargs)
+                else:
+                    messages.append(kwargs)
+        messages += self._outbox
+        self._outbox = []
+        return messages
+
+
+def prepare_processes(preload: List[str]) -> bool:
+    # workers are forked from a server process that imports the preloaded
+    # modules once, in parallel with the caller, instead of copying the
+    # caller or starting a fresh interpreter per worker
+    if "forkserver" not in mp.get_all_start_methods():
+        return False
+    mp.set_start_method("forkserver", force=True)
+    mp.set_forkserver_preload(preload)
+    forkserver.ensure_running()
+    return True
+
 
 class Publisher:
     def __init__(self) -> None:
@@ -109,19 +456,48 @@ class Publisher:
         self.subscribers: List[Subscriber] = []
         self.thread_subscribers: Dict[str, ThreadSubscriber] = {}
         self.process_subscribers: Dict[str, ProcessSubscriber] = {}
+        self.pool_subscribers: Dict[str, ProcessPoolSubscriber] = {}
+        self.wakeup = Wakeup()
+        self._pumping = False
+        self.pumps = 0
+        self.dispatched = 0
 
     def register_subscriber(
-        self, subscriber: Union[Subscriber, ThreadSubscriber, ProcessSubscriber]
+        self,
+        subscriber: Union[
+            Subscriber, ThreadSubscriber, ProcessSubscriber, ProcessPoolSubscriber
+        ],
     ) -> None:
         if isinstance(subscriber, Subscriber):
             self.subscribers.append(subscriber)
         elif isinstance(subscriber, ThreadSubscriber):
             self.thread_subscribers[subscriber.name] = subscriber
+            subscriber.worker.output_queue.wakeup = self.wakeup
         elif isinstance(subscriber, ProcessSubscriber):
             self.process_subscribers[subscriber.name] = subscriber
+        elif isinstance(subscriber, ProcessPoolSubscriber):
+            self.pool_subscribers[subscriber.name] = subscriber
+        # workers are already running and may have queued messages, and a
+        # pump watches the pipes of new ones
+        self.wakeup.set()
 
     def queue_message(self, topic: str, **kwargs: Any) -> None:
         self._message_queue.append((topic, kwargs))
+        # messages queued while pumping are delivered by the same pump
+        if not self._pumping:
+            self.wakeup.set()
+
+    def wakeup_fds(self) -> List[int]:
+        # readable whenever send_messages has something to deliver: the
+        # wakeup socket for this process and its threads, and the reading end
+        # of every worker process' output pipe
+        workers = [
+            subscriber.worker for subscriber in self.process_subscribers.values()
+        ]
+        for pool_subscriber in self.pool_subscribers.values():
+            workers += [subscriber.worker for subscriber in pool_subscriber.subscribers]
+        readers = [worker.output_queue._reader for worker in workers]  # type: ignore
+        return [self.wakeup.fileno()] + [reader.fileno() for reader in readers]
 
     def queue_thread_message(
         self,
@@ -139,8 +515,7 @@ class Publisher:
                 message_timeout, response_timeout, kwargs
             )
             return response
-        subscriber.queue_message_no_wait(kwargs)
-        return False
+        return subscriber.queue_message_no_wait(kwargs)
 
     def queue_process_message(
         self,
@@ -161,6 +536,54 @@ class Publisher:
         subscriber.queue_message_no_wait(kwargs)
         return False
 
+    def submit_job(
+        self, name: str, affinity: Optional[Hashable] = None, **kwargs: Any
+    ) -> Optional[int]:
+        subscriber = self.pool_subscribers.get(name, None)
+        if subscriber is None:
+            return None
+        return subscriber.submit(kwargs, affinity)
+
+    def race_jobs(self, name: str, entries: Dict[str, Dict[str, Any]]) -> Optional[int]:
+        subscriber = self.pool_subscribers.get(name, None)
+        if subscriber is None:
+            return None
+        return subscriber.race(entries)
+
+    def queue_job_message(self, name: str, job: int, **kwargs: Any) -> bool:
+        subscriber = self.pool_subscribers.get(name, None)
+        if subscriber is None:
+            return False
+        return subscriber.queue_message_no_wait(job, kwargs)
+
+    def control_job(
+        self,
+        name: str,
+        job: int,
+        command: int,
+        wait_for_response: bool = False,
+        timeout: float = 1,
+    ) -> bool:
+        subscriber = self.pool_subscribers.get(name, None)
+        if subscriber is None:
+            return False
+        return subscriber.control(job, command, wait_for_response, timeout)
+
+    def cancel_job(
+        self,
+        name: str,
+        job: int,
+        wait_for_response: bool = False,
+        timeout: float = 1,
+    ) -> bool:
+        subscriber = self.pool_subscribers.get(name, None)
+        if subscriber is None:
+            return False
+        cancelled = subscriber.cancel(job, wait_for_response, timeout)
+        # a race of jobs that never started ends without any worker output
+        self.wakeup.set()
+        return cancelled
+
     def _fetch_thread_messages(self) -> None:
         for name, thread_subscriber in self.thread_subscribers.items():
             while True:
@@ -179,14 +602,30 @@ class Publisher:
                     break
                 self.queue_message(**kwargs)
 
-    def send_messages(self) -> None:
-        self._fetch_thread_messages()
-        self._fetch_process_messages()
-        while self._message_queue:
-            topic, kwargs = self._message_queue.pop(0)
-            for subscriber in self.subscribers:
-                if topic == subscriber.topic:
-                    subscriber.receive_message(**kwargs)
+    def _fetch_pool_messages(self) -> None:
+        for name, pool_subscriber in self.pool_subscribers.items():
+            for kwargs in pool_subscriber.fetch_messages():
+                self.queue_message(**kwargs)
+
+    def send_messages(self) -> int:
+        self.wakeup.clear()
+        dispatched = 0
+        self._pumping = True
+        try:
+            self._fetch_thread_messages()
+            self._fetch_process_messages()
+            self._fetch_pool_messages()
+            while self._message_queue:
+                topic, kwargs = self._message_queue.pop(0)
+                dispatched += 1
+                for subscriber in self.subscribers:
+                    if topic == subscriber.topic:
+                        subscriber.receive_message(**kwargs)
+        finally:
+            self._pumping = False
+        self.pumps += 1
+        self.dispatched += dispatched
+        return dispatched
 
 
 PUBLISHER = Publisher()
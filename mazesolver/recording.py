@@ -0,0 +1,38 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from mazesolver.chaincode import ChainCode
+
+
+class Recording:
+    def __init__(self, order: np.ndarray, solution: Optional[ChainCode]) -> None:
+        self.order = order
+        self.solution: Tuple[np.ndarray, ...] = (np.zeros(0, dtype=np.int64),) * 2
+        if solution is not None:
+            self.solution = solution.region()
+        flat_order = order.ravel()
+        visited = np.flatnonzero(flat_order >= 0)
+        # every visited pixel has a unique step index, so scattering the
+        # pixel indexes by step yields the visit sequence without sorting
+        self.sequence = np.empty(visited.size, dtype=np.int64)
+        self.sequence[flat_order[visited]] = visited
+
+    def __len__(self) -> int:
+        return self.sequence.size
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.order.shape  # type: ignore[return-value]
+
+    def region(self, begin: int, end: int) -> Tuple[np.ndarray, ...]:
+        return np.unravel_index(self.sequence[begin:end], self.shape)
+
+    def split_solution(
+        self, position: int
+    ) -> Tuple[Tuple[np.ndarray, ...], Tuple[np.ndarray, ...]]:
+        steps = self.order[self.solution]
+        shown = (steps >= 0) & (steps < position)
+        visited = tuple(axis[shown] for axis in self.solution)
+        hidden = tuple(axis[~shown] for axis in self.solution)
+        return visited, hidden
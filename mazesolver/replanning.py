@@ -0,0 +1,167 @@
+import heapq
+from array import array
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from mazesolver.budget import MemoryBudget, index_type
+from mazesolver.config import MAX_PIXEL_COST
+from mazesolver.types import Point
+
+PlanKey = Tuple[Any, ...]
+
+
+class Planner:
+    # Lifelong Planning A*: g is the distance settled so far and rhs the one
+    # its neighbours imply, only the pixels where the two differ are queued,
+    # so a changed pixel only disturbs the distances that run through it
+    CONTROL_INTERVAL = 16
+
+    def __init__(
+        self,
+        key: PlanKey,
+        grid: np.ndarray,
+        start: Tuple[int, int],
+        end: Tuple[int, int],
+        heuristic: bool,
+        budget: MemoryBudget,
+    ) -> None:
+        self.key = key
+        height, width = grid.shape
+        self.width = width
+        self.size = height * width
+        self.start = start[0] * width + start[1]
+        self.end = end[0] * width + end[1]
+        self.end_row, self.end_column = end
+        self.heuristic = heuristic
+        self.infinity = self.size * (MAX_PIXEL_COST + 1)
+        # the grid the distances hold for, kept whole for diffing the next one
+        self.grid = grid.ravel().copy()
+        self.costs = budget.copy(self.grid, "B")
+        self.g = budget.full(self.size, self.infinity, index_type(self.infinity))
+        self.rhs = budget.full(self.size, self.infinity, index_type(self.infinity))
+        self.rhs[self.start] = 0
+        self.heap: List[Tuple[int, int, int]] = []
+        self._push(self.start)
+        # bytes of the grids, held between solves and charged to the next one
+        self.retained = 0
+
+    @property
+    def found(self) -> bool:
+        return self.g[self.end] < self.infinity
+
+    def _estimate(self, pixel: int) -> int:
+        if not self.heuristic:
+            return 0
+        # every step costs at least 1, so the Manhattan distance never
+        # overestimates
+        row, column = divmod(pixel, self.width)
+        return abs(row - self.end_row) + abs(column - self.end_column)
+
+    def _push(self, pixel: int) -> None:
+        distance = min(self.g[pixel], self.rhs[pixel])
+        heapq.heappush(self.heap, (distance + self._estimate(pixel), distance, pixel))
+
+    def _neighbours(self, pixel: int) -> Tuple[int, int, int, int]:
+        column = pixel % self.width
+        return (
+            pixel + 1 if column < self.width - 1 else -1,
+            pixel + self.width if pixel + self.width < self.size else -1,
+            pixel - 1 if column > 0 else -1,
+            pixel - self.width,
+        )
+
+    def _update(self, pixel: int) -> None:
+        # entering a pixel costs its own cost, walls cost 0 and are never
+        # entered, while the start is left even from a wall
+        if pixel != self.start:
+            cost = self.costs[pixel]
+            distance = self.infinity
+            if cost:
+                for neighbour in self._neighbours(pixel):
+                    if neighbour >= 0 and self.g[neighbour] + cost < distance:
+                        distance = self.g[neighbour] + cost
+            self.rhs[pixel] = distance
+        if self.g[pixel] != self.rhs[pixel]:
+            self._push(pixel)
+
+    def diff(self, grid: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(self.grid != grid.ravel())
+
+    def update(self, grid: np.ndarray, changed: np.ndarray) -> None:
+        self.grid[changed] = grid.ravel()[changed]
+        for pixel, cost in zip(changed.tolist(), self.grid[changed].tolist()):
+            self.costs[pixel] = cost
+        for pixel in changed.tolist():
+            self._update(pixel)
+
+    def compute(
+        self, limit: int, visits: "array[int]", pending: Callable[[], bool]
+    ) -> Tuple[int, bool]:
+        # runs until the end is settled and nothing queued could still
+        # shorten it, or for at most limit expansions
+        g, rhs, costs, heap = self.g, self.rhs, self.costs, self.heap
+        start, end, infinity = self.start, self.end, self.infinity
+        estimate = self._estimate
+        expanded = 0
+        while heap:
+            key, distance, pixel = heap[0]
+            current = min(g[pixel], rhs[pixel])
+            # entries are left behind when a pixel is queued again
+            if g[pixel] == rhs[pixel] or current != distance:
+                heapq.heappop(heap)
+                continue
+            end_distance = min(g[end], rhs[end])
+            if g[end] == rhs[end] and (key, distance) >= (end_distance, end_distance):
+                return expanded, True
+            if expanded >= limit:
+                return expanded, False
+            if expanded % self.CONTROL_INTERVAL == 0 and pending():
+                return expanded, False
+            heapq.heappop(heap)
+            expanded += 1
+            if pixel != start:
+                visits.append(pixel)
+            if g[pixel] > rhs[pixel]:
+                distance = g[pixel] = rhs[pixel]
+                for neighbour in self._neighbours(pixel):
+                    if neighbour < 0 or neighbour == start:
+                        continue
+                    cost = costs[neighbour]
+                    if cost and distance + cost < rhs[neighbour]:
+                        rhs[neighbour] = distance + cost
+                        heapq.heappush(
+                            heap,
+                            (
+                                distance + cost + estimate(neighbour),
+                                distance + cost,
+                                neighbour,
+                            ),
+                        )
+            else:
+                # a distance that grew is given up and rebuilt from the
+                # neighbours that still hold
+                g[pixel] = infinity
+                self._update(pixel)
+                for neighbour in self._neighbours(pixel):
+                    if neighbour >= 0:
+                        self._update(neighbour)
+        return expanded, True
+
+    def path(self) -> Optional[List[Point]]:
+        if not self.found:
+            return None
+        g, width = self.g, self.width
+        pixel = self.end
+        path = [Point(*divmod(pixel, width))]
+        while pixel != self.start:
+            # entering the pixel costs the same from every side, so the path
+            # comes from the neighbour closest to the start
+            previous = pixel
+            for neighbour in self._neighbours(pixel):
+                if neighbour >= 0 and g[neighbour] < g[previous]:
+                    previous = neighbour
+            pixel = previous
+            path.append(Point(*divmod(pixel, width)))
+        path.reverse()
+        return path
@@ -0,0 +1,543 @@
+import argparse
+import asyncio
+import base64
+import json
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from mazesolver.chaincode import ChainCode, encode_path
+from mazesolver.config import (
+    ALGORITHMS,
+    DEFAULT_ALGORITHM,
+    DEFAULT_FRAMERATE,
+    DEFAULT_MEMORY_BUDGET,
+    DEFAULT_SCALE_RESOLUTION,
+    DEFAULT_SOLVERS,
+    KEEPALIVE_TIMEOUT,
+    MAX_FRAMERATE,
+    MAX_REQUEST_SIZE,
+    MAX_RESOLUTION,
+    MAX_TILE_WORKERS,
+    MIN_FRAMERATE,
+    MIN_RESOLUTION,
+    PRELOAD_MODULES,
+    SERVER_HOST,
+    SERVER_PORT,
+    WEIGHTED_ALGORITHMS,
+)
+from mazesolver.image import MazeImage
+from mazesolver.parallel import ParallelSolver
+from mazesolver.portfolio import PortfolioStats, get_entries
+from mazesolver.pubsub import Publisher, Subscriber, prepare_processes
+from mazesolver.solver import Solver, SolverPool
+from mazesolver.state import ApplicationState
+from mazesolver.types import Point
+
+Notify = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SOLVE_CANCELLED = -32000
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def encode_array(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+def decode_grid(grid: Dict[str, Any]) -> np.ndarray:
+    try:
+        width, height = int(grid["width"]), int(grid["height"])
+        packed = np.frombuffer(base64.b64decode(grid["data"]), dtype=np.uint8)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RpcError(INVALID_PARAMS, "Invalid grid") from e
+    bits = np.unpackbits(packed)
+    if width <= 0 or height <= 0 or bits.size < width * height:
+        raise RpcError(INVALID_PARAMS, "Invalid grid size")
+    return bits[: width * height].reshape(height, width) * np.uint8(255)
+
+
+class SolveService:
+    PUMP_INTERVAL = 0.005
+
+    def __init__(
+        self,
+        workers: int,
+        max_concurrent: int,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> None:
+        self.publisher = Publisher()
+        self.pool = SolverPool(size=workers)
+        self.publisher.register_subscriber(self.pool)
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.jobs: Dict[int, "asyncio.Queue[Tuple[str, Dict[str, Any]]]"] = {}
+        self.memory_budget = memory_budget
+        self.portfolio = PortfolioStats()
+        topics = ["ImagePixelReplaceRequest", "ImagePathReplaceRequest", "RaceDone"]
+        topics += ["MazeSolveDegraded"] + Solver.DONE_TOPICS
+        for topic in topics:
+            subscriber = Subscriber(topic, function=partial(self._route, topic))
+            self.publisher.register_subscriber(subscriber)
+
+    def _route(self, topic: str, job: Optional[int] = None, **kwargs: Any) -> None:
+        queue = self.jobs.get(job, None) if job is not None else None
+        if queue is not None:
+            queue.put_nowait((topic, kwargs))
+
+    async def pump(self) -> None:
+        loop = asyncio.get_running_loop()
+        fds = self.publisher.wakeup_fds()
+        try:
+            for fd in fds:
+                loop.add_reader(fd, self.publisher.send_messages)
+        except NotImplementedError:
+            # the Windows proactor loop cannot watch pipes, they are polled
+            while True:
+                self.publisher.send_messages()
+                await asyncio.sleep(self.PUMP_INTERVAL)
+        try:
+            self.publisher.send_messages()
+            await loop.create_future()
+        finally:
+            for fd in fds:
+                loop.remove_reader(fd)
+
+    def _load_image(self, params: Dict[str, Any]) -> MazeImage:
+        image = MazeImage()
+        if "grid" in params:
+            bw_pixels = decode_grid(params["grid"])
+            image.set_pixels(np.dstack([bw_pixels] * 3), bw_pixels)
+            self._set_maze_key(params, image)
+            return image
+        if "image_path" not in params:
+            raise RpcError(INVALID_PARAMS, "Either image_path or grid is required")
+        image.scaled_resolution = self._get_integer(
+            params,
+            "resolution",
+            DEFAULT_SCALE_RESOLUTION,
+            MIN_RESOLUTION,
+            MAX_RESOLUTION,
+        )
+        try:
+            image.load_image(params["image_path"])
+        except ValueError as e:
+            raise RpcError(INVALID_PARAMS, "Invalid Image") from e
+        self._set_maze_key(params, image)
+        return image
+
+    def _set_maze_key(self, params: Dict[str, Any], image: MazeImage) -> None:
+        # a client sending a touched up maze names the one it solved before,
+        # so the search over it can be repaired
+        maze = params.get("maze", None)
+        if maze is None:
+            return
+        if not isinstance(maze, str) or not maze:
+            raise RpcError(INVALID_PARAMS, "Invalid maze")
+        image.maze_key = maze
+
+    def _get_point(self, params: Dict[str, Any], key: str, image: MazeImage) -> Point:
+        try:
+            x, y = (int(value) for value in params[key])
+        except (KeyError, TypeError, ValueError) as e:
+            raise RpcError(INVALID_PARAMS, f"Invalid {key} point") from e
+        height, width = image.shape
+        if not (0 <= x < width and 0 <= y < height):
+            raise RpcError(INVALID_PARAMS, f"{key} point outside the maze")
+        return Point(x, y)
+
+    def _get_algorithm(self, params: Dict[str, Any]) -> str:
+        algorithm = params.get("algorithm", DEFAULT_ALGORITHM)
+        if algorithm not in ALGORITHMS:
+            raise RpcError(INVALID_PARAMS, f"Unknown algorithm: {algorithm}")
+        return str(algorithm)
+
+    def _get_integer(
+        self, params: Dict[str, Any], key: str, default: int, minimum: int, maximum: int
+    ) -> int:
+        try:
+            value = int(params.get(key, default))
+        except (TypeError, ValueError) as e:
+            raise RpcError(INVALID_PARAMS, f"Invalid {key}") from e
+        if not minimum <= value <= maximum:
+            raise RpcError(
+                INVALID_PARAMS, f"{key} must be between {minimum} and {maximum}"
+            )
+        return value
+
+    def _get_memory_budget(self, params: Dict[str, Any]) -> int:
+        try:
+            memory_budget = int(params.get("memory_budget", self.memory_budget))
+        except (TypeError, ValueError) as e:
+            raise RpcError(INVALID_PARAMS, "Invalid memory_budget") from e
+        if memory_budget < 0:
+            raise RpcError(INVALID_PARAMS, "Invalid memory_budget")
+        return memory_budget
+
+    def _flatten(self, region: Any, width: int) -> np.ndarray:
+        rows, columns = region
+        return (np.asarray(rows) * width + np.asarray(columns)).astype(np.int32)
+
+    async def solve(self, params: Dict[str, Any], notify: Notify) -> Dict[str, Any]:
+        # loading and preparing the maze is most of the work of a small solve,
+        # so it is limited along with the search
+        async with self.semaphore:
+            return await self._solve(params, notify)
+
+    async def _solve(self, params: Dict[str, Any], notify: Notify) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(None, self._load_image, params)
+        workers = self._get_integer(params, "parallel", 0, 0, MAX_TILE_WORKERS)
+        if workers:
+            return await loop.run_in_executor(
+                None, self._solve_parallel, params, image, workers
+            )
+        lattice = None
+        if params.get("lattice", False):
+            lattice = await loop.run_in_executor(None, image.get_lattice)
+        # the cells of a lattice are prepared by the solver
+        if lattice is None and params.get("algorithm", None) in WEIGHTED_ALGORITHMS:
+            await loop.run_in_executor(None, image.get_cost_map)
+        height, width = image.shape
+        progress = bool(params.get("progress", False))
+        state = ApplicationState(
+            image,
+            framerate=str(
+                self._get_integer(
+                    params, "framerate", DEFAULT_FRAMERATE, MIN_FRAMERATE, MAX_FRAMERATE
+                )
+            ),
+            start_point=self._get_point(params, "start", image),
+            end_point=self._get_point(params, "end", image),
+            max_throughput=not progress,
+            algorithm=self._get_algorithm(params),
+            prune=bool(params.get("prune", False)),
+            portfolio=bool(params.get("portfolio", False)),
+            memory_budget=self._get_memory_budget(params),
+            lattice=bool(params.get("lattice", False)),
+            # a search is only repaired for a client naming the maze again, or
+            # one asking to keep it for that
+            replan=bool(params.get("replan", "maze" in params)),
+        )
+        pruned = None
+        # the pruned strategies of a race prune inside the race
+        if state.prune and not state.portfolio and lattice is None:
+            _, pruned = await loop.run_in_executor(
+                None,
+                image.get_pruned,
+                state.start_point,
+                state.end_point,
+                state.algorithm not in WEIGHTED_ALGORITHMS,
+            )
+        maze_type = None
+        if state.portfolio:
+            maze_type = await loop.run_in_executor(
+                None, self.portfolio.classifier.classify, image
+            )
+        queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+        if maze_type is not None:
+            job = self.pool.race(get_entries(state))
+            self.portfolio.maze_types[job] = maze_type
+        else:
+            job = self.pool.submit(
+                {"start": True, "state": state}, affinity=image.maze_key
+            )
+        self.jobs[job] = queue
+        finished = False
+        try:
+            await notify("started", {"job": job})
+            path: Optional[ChainCode] = None
+            visited = 0
+            degraded: List[Dict[str, Any]] = []
+            result: Dict[str, Any] = {}
+            while True:
+                topic, kwargs = await queue.get()
+                if topic == "MazeSolveCancelled":
+                    finished = True
+                    raise RpcError(SOLVE_CANCELLED, "Solve cancelled")
+                if topic == "RaceDone":
+                    summary = self.portfolio.record(job, **kwargs)
+                    result["portfolio"] = {
+                        "maze_type": maze_type,
+                        "winner": kwargs["winner"],
+                        "elapsed": kwargs["elapsed"],
+                        "summary": summary,
+                    }
+                    return result
+                if topic == "MazeSolveDone":
+                    finished = True
+                    result = {
+                        "job": job,
+                        "maze": image.maze_key,
+                        "width": width,
+                        "height": height,
+                        "length": kwargs["length"],
+                        "visited": visited,
+                        "path": path.to_json() if path is not None else None,
+                        "stats": kwargs["stats"],
+                        "memory": image.memory_usage(),
+                        "pruned": pruned,
+                        "degraded": degraded,
+                        "lattice": None,
+                    }
+                    if lattice is not None:
+                        result["lattice"] = {
+                            "rows": lattice.shape[0],
+                            "columns": lattice.shape[1],
+                            "pitch": lattice.pitch,
+                            "wall": lattice.wall,
+                        }
+                    # a race reports once its losers have stopped
+                    if maze_type is None:
+                        return result
+                    continue
+                if topic == "ImagePathReplaceRequest":
+                    path = kwargs["path"]
+                    continue
+                if topic == "MazeSolveDegraded":
+                    # the search starts over with more compact storage
+                    visited = 0
+                    degraded.append(
+                        {
+                            "storage": kwargs["storage"],
+                            "projected": kwargs["projected"],
+                        }
+                    )
+                    if progress:
+                        await notify("degraded", dict(degraded[-1], job=job))
+                    continue
+                pixels = self._flatten(kwargs["region"], width)
+                visited += pixels.size
+                if progress:
+                    await notify(
+                        "progress",
+                        {
+                            "job": job,
+                            "visited": visited,
+                            "delta": encode_array(pixels),
+                        },
+                    )
+        finally:
+            del self.jobs[job]
+            if not finished:
+                self.pool.cancel(job)
+
+    def _solve_parallel(
+        self, params: Dict[str, Any], image: MazeImage, workers: int
+    ) -> Dict[str, Any]:
+        # the tiles expand breadth first over the pixels, so only the step
+        # counting algorithms match them, and without their extras
+        if self._get_algorithm(params) in WEIGHTED_ALGORITHMS or any(
+            params.get(key, False) for key in ("prune", "portfolio", "lattice")
+        ):
+            raise RpcError(INVALID_PARAMS, "Parallel solves only count steps")
+        state = ApplicationState(
+            image,
+            start_point=self._get_point(params, "start", image),
+            end_point=self._get_point(params, "end", image),
+        )
+        solver = ParallelSolver(workers)
+        try:
+            path = solver.solve(state)
+        except RuntimeError as e:
+            raise RpcError(INTERNAL_ERROR, str(e)) from e
+        height, width = image.shape
+        return {
+            "maze": image.maze_key,
+            "width": width,
+            "height": height,
+            "length": len(path) if path is not None else None,
+            "path": encode_path(path).to_json() if path is not None else None,
+            "parallel": {
+                "elapsed": solver.elapsed_time,
+                "workers": [
+                    dict(stats._asdict(), utilization=stats.utilization)
+                    for stats in solver.stats
+                ],
+            },
+        }
+
+    def cancel(self, params: Dict[str, Any]) -> bool:
+        try:
+            job = int(params["job"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise RpcError(INVALID_PARAMS, "Invalid job") from e
+        return self.pool.cancel(job)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self.pool.subscribers),
+            "idle": len(self.pool.idle),
+            "running": sorted(self.pool.running),
+            "pending": [job for job, _ in self.pool.pending],
+        }
+
+
+class Connection:
+    def __init__(
+        self,
+        service: SolveService,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        self.service = service
+        self.reader = reader
+        self.writer = writer
+        self.tasks: Set["asyncio.Task[None]"] = set()
+
+    async def _write(self, message: Dict[str, Any]) -> None:
+        message["jsonrpc"] = "2.0"
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.writer.drain()
+
+    async def _respond(self, request_id: Any, result: Any) -> None:
+        if request_id is not None:
+            await self._write({"id": request_id, "result": result})
+
+    async def _error(self, request_id: Any, code: int, message: str) -> None:
+        await self._write(
+            {"id": request_id, "error": {"code": code, "message": message}}
+        )
+
+    async def _notify(
+        self, request_id: Any, method: str, params: Dict[str, Any]
+    ) -> None:
+        await self._write({"method": method, "params": dict(params, id=request_id)})
+
+    async def _dispatch(self, request: Dict[str, Any]) -> None:
+        request_id = request.get("id", None)
+        method = request.get("method", None)
+        params = request.get("params", {})
+        try:
+            if not isinstance(method, str) or not isinstance(params, dict):
+                raise RpcError(INVALID_REQUEST, "Invalid Request")
+            if method == "solve":
+                notify = partial(self._notify, request_id)
+                result: Any = await self.service.solve(params, notify)
+            elif method == "cancel":
+                result = self.service.cancel(params)
+            elif method == "stats":
+                result = self.service.stats()
+            else:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+        except RpcError as e:
+            await self._error(request_id, e.code, e.message)
+            return
+        except Exception:
+            await self._error(request_id, INTERNAL_ERROR, "Internal error")
+            return
+        await self._respond(request_id, result)
+
+    def _start_request(self, line: bytes) -> None:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            task = asyncio.ensure_future(self._error(None, PARSE_ERROR, "Parse error"))
+        else:
+            task = asyncio.ensure_future(self._dispatch(request))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def serve(self) -> None:
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(
+                        self.reader.readline(), KEEPALIVE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    # idle connections are dropped, busy ones are kept alive
+                    if self.tasks:
+                        continue
+                    break
+                except ValueError:
+                    # the rest of the line cannot be told from the next request
+                    await self._error(
+                        None, INVALID_REQUEST, f"Request over {MAX_REQUEST_SIZE} bytes"
+                    )
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    self._start_request(line)
+        except ConnectionError:
+            pass
+        finally:
+            # nobody is left to answer, so the solves of a closed connection
+            # are cancelled
+            for task in self.tasks:
+                task.cancel()
+            self.writer.close()
+
+
+async def serve(
+    host: str,
+    port: int,
+    unix: Optional[str],
+    workers: int,
+    max_concurrent: int,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> None:
+    service = SolveService(workers, max_concurrent, memory_budget)
+
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        await Connection(service, reader, writer).serve()
+
+    if unix:
+        server = await asyncio.start_unix_server(
+            handle, path=unix, limit=MAX_REQUEST_SIZE
+        )
+    else:
+        server = await asyncio.start_server(
+            handle, host=host, port=port, limit=MAX_REQUEST_SIZE
+        )
+    pump = asyncio.ensure_future(service.pump())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pump.cancel()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m mazesolver serve")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--unix", default=None, help="serve on a Unix socket")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SOLVERS)
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_SOLVERS)
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET,
+        help="per solve, in MiB, 0 for no limit",
+    )
+    args = parser.parse_args(argv)
+    prepare_processes(PRELOAD_MODULES)
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                args.unix,
+                args.workers,
+                args.max_concurrent,
+                args.memory_budget,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
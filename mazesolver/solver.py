@@ -1,31 +1,91 @@
+import heapq
+from array import array
+from collections import deque
+from dataclasses import replace
 from queue import Empty, Full
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from mazesolver.pubsub import ProcessWorker
+from mazesolver.budget import (
+    HEAP_ENTRY,
+    LIST_SIZE,
+    POINT_SIZE,
+    POINTER,
+    QUEUED_INT,
+    BudgetExceeded,
+    MemoryBudget,
+    index_type,
+)
+from mazesolver.chaincode import ChainCode, encode_path
+from mazesolver.config import (
+    DEFAULT_SOLVERS,
+    MAX_PIXEL_COST,
+    REPLAN_MAX_CHANGE,
+    WEIGHTED_ALGORITHMS,
+)
+from mazesolver.lattice import Lattice
+from mazesolver.pubsub import ControlBlock, ProcessPoolSubscriber, ProcessWorker
+from mazesolver.replanning import PlanKey, Planner
 from mazesolver.state import ApplicationState
-from mazesolver.timer import Timer
+from mazesolver.timer import FrameScheduler
 from mazesolver.types import Color, Point
 
+Search = Generator[int, None, Optional[List[Point]]]
 
 
 class Solver(ProcessWorker):
     VISITED_VALUE = 200
     VISITED_COLOR = Color(200, 200, 200)
     SOLUTION_COLOR = Color(0, 0, 255)
+    DONE_TOPICS = ["MazeSolveDone", "MazeSolveCancelled"]
+    CONTROL_INTERVAL = 16
 
     def __init__(self) -> None:
         super().__init__(input_size=1, output_size=1, daemon=True)
+        self.job: Optional[int] = None
         self.reset = False
-        self.waiting = False
+        self.generation = 0
         self.image: np.ndarray = np.zeros(0)
+        self.passable: np.ndarray = np.zeros(0, dtype=bool)
         self.visited: np.ndarray = np.zeros(0)
-        self.solution: np.ndarray = np.zeros(0)
+        self.solution: Optional[ChainCode] = None
+        # flat indexes of the visited pixels, in the order they were visited
+        self.visit_sequence: "array[int]" = array("i")
+        self.sent_steps = 0
+        self.record = False
         self.start_point = Point(0, 0)
         self.end_point = Point(0, 0)
-        self.frametime = 1 / 15
-        self.timer = Timer()
+        self.scheduler = FrameScheduler(1 / 15)
+        self.budget = MemoryBudget()
+        self.lattice: Optional[Lattice] = None
+        # the start and end pixels and the open pixels, while the search runs
+        # on lattice cells
+        self.pixel_points: Tuple[Point, Point] = (Point(0, 0), Point(0, 0))
+        self.pixel_passable: np.ndarray = np.zeros((0, 0), dtype=bool)
+        # the last search of this worker, repaired when the same maze is
+        # solved again after a few pixels changed
+        self.planner: Optional[Planner] = None
+        self.plan_key: Optional[PlanKey] = None
+        self.replanned: Optional[int] = None
+
+    def _use_lattice(self, state: ApplicationState) -> ApplicationState:
+        self.lattice = state.image.get_lattice() if state.lattice else None
+        if self.lattice is None or self.lattice.image is None:
+            return state
+        # the search runs on the cells and only what it sends is mapped back
+        # to pixels
+        self.pixel_points = (state.start_point, state.end_point)
+        bw_pixels = self.pixel_passable = state.image.bw_pixels
+        start, end = state.start_point, state.end_point
+        # a solve on cells is reported as unpruned, so the cells are not pruned
+        return replace(
+            state,
+            image=self.lattice.image,
+            start_point=self.lattice.to_cell(start, bw_pixels[start.y, start.x]),
+            end_point=self.lattice.to_cell(end, bw_pixels[end.y, end.x]),
+            prune=False,
+        )
 
     def _load_state(self, state: ApplicationState) -> None:
         self.image = state.image
@@ -33,41 +93,120 @@ class Solver(ProcessWorker):
         # form (y, x), instead of (x, y)
         self.start_point = state.start_point[::-1]
         self.end_point = state.end_point[::-1]
-        self.frametime = 1 / int(state.framerate)
-        self.visited = np.zeros(self.image.bw_pixels.shape, dtype=np.uint8)
-        self.solution = np.zeros(self.image.bw_pixels.shape, dtype=np.uint8)
+        # a recorded solve is replayed by the GUI, so it runs at full speed
+        self.record = state.record
+        self.scheduler.frametime = None
+        if not (state.max_throughput or state.record):
+            self.scheduler.frametime = 1 / int(state.framerate)
+        self.passable = self.image.bw_pixels
+        if state.prune:
+            self.passable, _ = self.image.get_pruned(
+                state.start_point,
+                state.end_point,
+                cut_corners=state.algorithm not in WEIGHTED_ALGORITHMS,
+            )
+        self.budget = MemoryBudget(state.memory_budget * 2**20)
+        self.plan_key = None
+        if state.replan and not state.prune:
+            self.plan_key = (
+                self.image.maze_key,
+                self.image.shape,
+                state.algorithm,
+                self.start_point,
+                self.end_point,
+            )
+        self.replanned = None
+        self._reset_search()
+
+    def _reset_search(self) -> None:
+        self.visited = np.zeros(self.image.shape, dtype=np.uint8)
+        self.solution = None
+        self.visit_sequence = array(index_type(self.visited.size))
+        self.sent_steps = 0
+        self.budget.reset(self.visited.nbytes)
+
+    def _get_reachable(self, state: ApplicationState) -> int:
+        # the search visits at most the component it starts in
+        labels = self.image.get_labels()
+        x, y = state.start_point
+        if labels[y, x] == 0:
+            return int(np.count_nonzero(self.passable))
+        return int(np.count_nonzero(labels == labels[y, x]))
 
     def _get_adjacent_pixels(self, pixel: Point) -> List[Point]:
         x, y = pixel
         return [Point(x + 1, y), Point(x, y + 1), Point(x - 1, y), Point(x, y - 1)]
 
     def _mark_solution(self, path: List[Point]) -> None:
-        for x in path:
-            self.solution[x] = self.VISITED_VALUE
+        self.solution = encode_path(path)
+
+    def _get_visited_delta(self) -> Tuple[np.ndarray, ...]:
+        delta = np.frombuffer(self.visit_sequence, dtype=self.visit_sequence.typecode)
+        rows, columns = np.divmod(
+            delta[self.sent_steps :].astype(np.int64), self.visited.shape[1]
+        )
+        if self.lattice is not None:
+            # cells are painted whole, but for the anti-aliased edges of walls
+            rows, columns = self.lattice.expand(rows, columns)
+            kept = self.pixel_passable[rows, columns]
+            return rows[kept], columns[kept]
+        return rows, columns
+
+    def _get_visit_order(self) -> np.ndarray:
+        order = np.full(self.visited.size, -1, dtype=np.int32)
+        sequence = np.frombuffer(
+            self.visit_sequence, dtype=self.visit_sequence.typecode
+        )
+        order[sequence] = np.arange(len(sequence), dtype=np.int32)
+        grid = order.reshape(self.visited.shape)
+        if self.lattice is not None:
+            grid = self.lattice.expand_grid(grid)
+            grid[~self.pixel_passable] = -1
+        return grid
 
     def _send_visited_pixels(self, block: bool = False) -> None:
-        region = self.visited.nonzero()
+        # only the pixels visited since the last frame are sent, the GUI
+        # accumulates them on its own copy of the result
+        region = self._get_visited_delta()
+        steps = len(self.visit_sequence)
         try:
             self.output_queue.put(
                 {
                     "topic": "ImagePixelReplaceRequest",
                     "region": region,
                     "color": self.VISITED_COLOR,
+                    "job": self.job,
                 },
                 block=block,
                 timeout=0.5,
             )
         except Full:
-            pass
+            return
+        self.sent_steps = steps
 
     def _send_solution(self) -> None:
-        region = self.solution.nonzero()
         try:
             self.output_queue.put(
                 {
-                    "topic": "ImagePixelReplaceRequest",
-                    "region": region,
+                    "topic": "ImagePathReplaceRequest",
+                    "path": self.solution,
                     "color": self.SOLUTION_COLOR,
+                    "job": self.job,
+                },
+                block=True,
+                timeout=0.5,
+            )
+        except Full:
+            pass
+
+    def _send_recording(self) -> None:
+        try:
+            self.output_queue.put(
+                {
+                    "topic": "MazeRecording",
+                    "order": self._get_visit_order(),
+                    "solution": self.solution,
+                    "job": self.job,
                 },
                 block=True,
                 timeout=0.5,
@@ -78,15 +217,73 @@ class Solver(ProcessWorker):
     def _send_image_reset_request(self) -> None:
         try:
             self.output_queue.put(
-                {"topic": "ImageResetRequest"}, block=True, timeout=0.5,
+                {"topic": "ImageResetRequest", "job": self.job},
+                block=True,
+                timeout=0.5,
+            )
+        except Full:
+            pass
+
+    def _get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.scheduler.stats,
+            visited=len(self.visit_sequence),
+            memory=self.budget.peak,
+            storage=self.budget.storage_name,
+            replanned=self.replanned,
+        )
+
+    def _send_degraded_message(self, projected: int) -> None:
+        try:
+            self.output_queue.put(
+                {
+                    "topic": "MazeSolveDegraded",
+                    "job": self.job,
+                    "storage": self.budget.storage_name,
+                    "projected": projected,
+                    "budget": self.budget.limit,
+                },
+                block=True,
+                timeout=0.5,
             )
         except Full:
             pass
 
-    def _send_done_message(self) -> None:
+    def _send_replanned_message(self, changed: int) -> None:
         try:
             self.output_queue.put(
-                {"topic": "MazeSolveDone"}, block=True, timeout=0.5,
+                {"topic": "MazeReplanned", "job": self.job, "changed": changed},
+                block=True,
+                timeout=0.5,
+            )
+        except Full:
+            pass
+
+    def _send_cancelled_message(self) -> None:
+        try:
+            self.output_queue.put(
+                {
+                    "topic": "MazeSolveCancelled",
+                    "job": self.job,
+                    "stats": self._get_stats(),
+                },
+                block=True,
+                timeout=0.5,
+            )
+        except Full:
+            pass
+
+    def _send_done_message(self, length: Optional[int] = None) -> None:
+        try:
+            self.output_queue.put(
+                {
+                    "topic": "MazeSolveDone",
+                    "job": self.job,
+                    "length": length,
+                    "stats": self._get_stats(),
+                },
+                block=True,
+                timeout=0.5,
             )
         except Full:
             pass
@@ -94,11 +291,20 @@ class Solver(ProcessWorker):
     def _process_run_message(self, kwargs: Any) -> None:
         if kwargs.get("start", False):
             state = kwargs["state"]
-            self.solve(state)
-        elif kwargs.get("reset", False):
-            self.response.set()
+            self.job = kwargs.get("job", None)
+            self.control.state = ControlBlock.RUNNING
+            try:
+                self.solve(state)
+            except Exception:
+                # the job still has to end, or its worker is never freed
+                self.planner = None
+                self.reset = False
+                self._send_cancelled_message()
+            self.control.state = ControlBlock.IDLE
+            self._acknowledge_stale_commands()
 
     def run(self) -> None:
+        self.output_queue.put({"topic": "SolverReady", "name": self.name})
         while True:
             message_received = False
             self.received.wait()
@@ -112,89 +318,389 @@ class Solver(ProcessWorker):
             if message_received:
                 self.clear_queue()
 
-    def _process_solving_message(self, kwargs: Dict[str, bool]) -> None:
-        if kwargs.get("stop", False):
+    def _acknowledge_stale_commands(self) -> None:
+        # commands for a job that already finished are acknowledged unanswered,
+        # those for a job this worker has not started yet are left pending
+        job, generation, _ = self.control.read()
+        if self.job is not None and job <= self.job:
+            self.generation = generation
+            self.control.acknowledge(generation)
+
+    def _take_command(self) -> Optional[int]:
+        if not self.control.pending(self.generation):
+            return None
+        job, generation, command = self.control.read()
+        if self.job is None or job > self.job:
+            return None
+        self.generation = generation
+        if job != self.job:
+            self.control.acknowledge(generation)
+            return None
+        # a cancel is acknowledged once the search has been abandoned
+        if command != ControlBlock.CANCEL:
+            self.control.acknowledge(generation)
+        return command
+
+    def _poll_control(self) -> None:
+        command = self._take_command()
+        if command == ControlBlock.STOP:
             self._wait_for_resume()
-        elif kwargs.get("reset", False):
+        elif command == ControlBlock.CANCEL:
             self.reset = True
 
-    def _check_messages(self) -> None:
-        if not self.received.is_set():
-            return
+    def _wait_for_resume(self) -> None:
+        self.control.state = ControlBlock.STOPPED
         while True:
-            message_received = False
-            while True:
-                try:
-                    kwargs = self.input_queue.get(block=False)
-                except Empty:
-                    break
-                message_received = True
-                self._process_solving_message(kwargs)
-            if message_received:
-                self.clear_queue()
+            self.received.clear()
+            command = self._take_command()
+            if command == ControlBlock.RUN:
                 break
+            if command == ControlBlock.CANCEL:
+                self.reset = True
+                break
+            if command is None:
+                self.received.wait()
+        self.control.state = ControlBlock.RUNNING
+        self.scheduler.restart_frame()
 
-    def _process_waiting_message(self, kwargs: Any) -> None:
-        if kwargs.get("resume", False):
-            self.waiting = False
-            self.clear_queue()
-        elif kwargs.get("reset", False):
-            self.waiting = False
-            self.reset = True
-            self.clear_queue()
+    def _finish(self, path: List[Point]) -> List[Point]:
+        if self.lattice is not None:
+            start, end = self.pixel_points
+            path = self.lattice.to_pixels(
+                path, start[::-1], end[::-1], self.pixel_passable
+            )
+        self._mark_solution(path)
+        self._send_visited_pixels(block=True)
+        self._send_solution()
+        self.clear_queue()
+        if self.record:
+            self._send_recording()
+        self._send_done_message(len(path))
+        return path
 
-    def _wait_for_resume(self) -> None:
-        self.waiting = True
-        self.received.clear()
-        while self.waiting:
-            message_received = False
-            self.received.wait()
-            while True:
-                try:
-                    kwargs = self.input_queue.get_nowait()
-                except Empty:
+    def _cancel(self) -> None:
+        self.reset = False
+        self.control.acknowledge(self.generation)
+        self._send_image_reset_request()
+        self._send_cancelled_message()
+
+    def _search_bfs(self) -> Search:
+        queue = [[self.start_point]]
+        height, width = self.image.shape
+        while queue:
+            expanded = 0
+            while queue and expanded < self.scheduler.batch_size:
+                if expanded % self.CONTROL_INTERVAL == 0 and self.control.pending(
+                    self.generation
+                ):
                     break
-                message_received = True
-                self._process_waiting_message(kwargs)
-            if message_received:
-                self.clear_queue()
+                expanded += 1
+                path = queue.pop(0)
+                current_pixel = path[-1]
+                if current_pixel == self.end_point:
+                    return path
+                adjacent_pixels = self._get_adjacent_pixels(current_pixel)
+                for pixel in adjacent_pixels:
+                    y, x = pixel
+                    if (
+                        x < 0 or y < 0 or x >= width or y >= height
+                    ) or not self.passable[pixel]:
+                        continue
+                    if self.visited[pixel] != self.VISITED_VALUE:
+                        self.visited[pixel] = self.VISITED_VALUE
+                        self.visit_sequence.append(y * width + x)
+                        new_path = list(path) + [pixel]
+                        queue.append(new_path)
+            # every queued path is as long as the last one or one pixel shorter
+            paths = len(queue) * (LIST_SIZE + POINTER * len(queue[-1])) if queue else 0
+            self.budget.frontier = paths + len(self.visit_sequence) * POINT_SIZE
+            yield expanded
+        return None
+
+    def _search_bfs_tree(self) -> Search:
+        # each pixel stores the pixel it was first reached from instead of
+        # each queued pixel storing its whole path
+        passable = self.budget.copy(self.passable, "B")
+        height, width = self.visited.shape
+        size = height * width
+        start = self.start_point[0] * width + self.start_point[1]
+        end = self.end_point[0] * width + self.end_point[1]
+        predecessors = self.budget.full(size, -1, index_type(size))
+        queue = deque([start])
+        while queue:
+            expanded = 0
+            while queue and expanded < self.scheduler.batch_size:
+                if expanded % self.CONTROL_INTERVAL == 0 and self.control.pending(
+                    self.generation
+                ):
+                    break
+                expanded += 1
+                pixel = queue.popleft()
+                if pixel == end:
+                    return self._trace_predecessors(predecessors, end)
+                column = pixel % width
+                for neighbour in (
+                    pixel + 1 if column < width - 1 else -1,
+                    pixel + width if pixel + width < size else -1,
+                    pixel - 1 if column > 0 else -1,
+                    pixel - width,
+                ):
+                    if (
+                        neighbour < 0
+                        or not passable[neighbour]
+                        or predecessors[neighbour] >= 0
+                        or neighbour == start
+                    ):
+                        continue
+                    predecessors[neighbour] = pixel
+                    self.visit_sequence.append(neighbour)
+                    queue.append(neighbour)
+            self.budget.frontier = len(queue) * QUEUED_INT
+            yield expanded
+        return None
+
+    def _trace_predecessors(self, predecessors: Sequence[int], end: int) -> List[Point]:
+        width = self.visited.shape[1]
+        path = []
+        pixel = end
+        while pixel != -1:
+            path.append(Point(*divmod(pixel, width)))
+            pixel = predecessors[pixel]
+        path.reverse()
+        return path
+
+    def _search_dijkstra(self) -> Search:
+        costs = self.budget.copy(
+            np.where(self.passable, self.image.get_cost_map(), 0), "B"
+        )
+        height, width = self.visited.shape
+        size = height * width
+        start = self.start_point[0] * width + self.start_point[1]
+        end = self.end_point[0] * width + self.end_point[1]
+        infinity = size * (MAX_PIXEL_COST + 1)
+        distances = self.budget.full(size, infinity, index_type(infinity))
+        predecessors = self.budget.full(size, -1, index_type(size))
+        settled = self.budget.full(size, 0, "B")
+        # Dial's algorithm: edge costs are at most MAX_PIXEL_COST, so a ring
+        # of MAX_PIXEL_COST + 1 buckets holds every tentative distance
+        buckets: List[List[int]] = [[] for _ in range(MAX_PIXEL_COST + 1)]
+        buckets[0].append(start)
+        distances[start] = 0
+        pending = 1
+        distance = 0
+        while pending:
+            expanded = 0
+            while pending and expanded < self.scheduler.batch_size:
+                if expanded % self.CONTROL_INTERVAL == 0 and self.control.pending(
+                    self.generation
+                ):
+                    break
+                bucket = buckets[distance % len(buckets)]
+                while not bucket:
+                    distance += 1
+                    bucket = buckets[distance % len(buckets)]
+                pixel = bucket.pop()
+                pending -= 1
+                if settled[pixel] or distances[pixel] != distance:
+                    continue
+                expanded += 1
+                settled[pixel] = 1
+                if pixel == end:
+                    return self._trace_predecessors(predecessors, end)
+                if pixel != start:
+                    self.visit_sequence.append(pixel)
+                column = pixel % width
+                for neighbour in (
+                    pixel + 1 if column < width - 1 else -1,
+                    pixel + width if pixel + width < size else -1,
+                    pixel - 1 if column > 0 else -1,
+                    pixel - width,
+                ):
+                    if neighbour < 0 or settled[neighbour] or not costs[neighbour]:
+                        continue
+                    new_distance = distance + costs[neighbour]
+                    if new_distance < distances[neighbour]:
+                        distances[neighbour] = new_distance
+                        predecessors[neighbour] = pixel
+                        buckets[new_distance % len(buckets)].append(neighbour)
+                        pending += 1
+            reached = len(self.visit_sequence) + pending
+            self.budget.frontier = pending * QUEUED_INT + self.budget.boxed(2 * reached)
+            yield expanded
+        return None
+
+    def _search_astar(self) -> Search:
+        passable = self.budget.copy(self.passable, "B")
+        height, width = self.visited.shape
+        size = height * width
+        start = self.start_point[0] * width + self.start_point[1]
+        end = self.end_point[0] * width + self.end_point[1]
+        end_row, end_column = self.end_point
+        distances = self.budget.full(size, size, index_type(size))
+        predecessors = self.budget.full(size, -1, index_type(size))
+        closed = self.budget.full(size, 0, "B")
+        distances[start] = 0
+        # the Manhattan distance never overestimates a 4-connected path, and
+        # among equal estimates the deepest pixel is expanded first
+        estimate = abs(start // width - end_row) + abs(start % width - end_column)
+        heap = [(estimate, 0, start)]
+        while heap:
+            expanded = 0
+            while heap and expanded < self.scheduler.batch_size:
+                if expanded % self.CONTROL_INTERVAL == 0 and self.control.pending(
+                    self.generation
+                ):
+                    break
+                _, negative_distance, pixel = heapq.heappop(heap)
+                if closed[pixel]:
+                    continue
+                expanded += 1
+                closed[pixel] = 1
+                if pixel == end:
+                    return self._trace_predecessors(predecessors, end)
+                if pixel != start:
+                    self.visit_sequence.append(pixel)
+                distance = 1 - negative_distance
+                column = pixel % width
+                for neighbour in (
+                    pixel + 1 if column < width - 1 else -1,
+                    pixel + width if pixel + width < size else -1,
+                    pixel - 1 if column > 0 else -1,
+                    pixel - width,
+                ):
+                    if neighbour < 0 or closed[neighbour] or not passable[neighbour]:
+                        continue
+                    if distance < distances[neighbour]:
+                        distances[neighbour] = distance
+                        predecessors[neighbour] = pixel
+                        row, next_column = divmod(neighbour, width)
+                        estimate = abs(row - end_row) + abs(next_column - end_column)
+                        heapq.heappush(
+                            heap, (distance + estimate, -distance, neighbour)
+                        )
+            reached = len(self.visit_sequence) + len(heap)
+            self.budget.frontier = len(heap) * HEAP_ENTRY + self.budget.boxed(
+                2 * reached
+            )
+            yield expanded
+        return None
+
+    def _get_planner(self, algorithm: str, key: PlanKey) -> Planner:
+        grid = self.passable.view(np.uint8)
+        if algorithm in WEIGHTED_ALGORITHMS:
+            costs = self.image.get_cost_map()
+            grid = np.where(self.passable, costs, 0).astype(np.uint8)
+        planner, self.planner = self.planner, None
+        if planner is not None and planner.key == key:
+            changed = planner.diff(grid)
+            # past a point repairing costs more than searching again
+            if changed.size <= REPLAN_MAX_CHANGE * grid.size:
+                self.budget.reset(self.visited.nbytes + planner.retained)
+                planner.update(grid, changed)
+                self.replanned = changed.size
+                self._send_replanned_message(changed.size)
+                return planner
+        # the old search is dropped before the new one is allocated
+        del planner
+        self.replanned = None
+        self.budget.reset(self.visited.nbytes + grid.size)
+        planner = Planner(
+            key,
+            grid,
+            self.start_point,
+            self.end_point,
+            algorithm == "A*",
+            self.budget,
+        )
+        planner.retained = self.budget.grids + grid.size
+        return planner
+
+    def _search_replan(self, algorithm: str, key: PlanKey) -> Search:
+        # the same order as the plain searches, but every distance is kept
+        # for repairing it later
+        planner = self.planner = self._get_planner(algorithm, key)
+        while True:
+            expanded, done = planner.compute(
+                self.scheduler.batch_size,
+                self.visit_sequence,
+                lambda: self.control.pending(self.generation),
+            )
+            reached = len(self.visit_sequence) + len(planner.heap)
+            self.budget.frontier = len(planner.heap) * HEAP_ENTRY + self.budget.boxed(
+                2 * reached
+            )
+            if done:
+                return planner.path()
+            yield expanded
+
+    def _get_search(self, algorithm: str) -> Search:
+        searches = {
+            "BFS": self._search_bfs,
+            "Dijkstra": self._search_dijkstra,
+            "A*": self._search_astar,
+        }
+        if self.plan_key is not None:
+            return self._search_replan(algorithm, self.plan_key)
+        if algorithm == "BFS" and self.budget.storage_name != "memory":
+            return self._search_bfs_tree()
+        return searches[algorithm]()
+
+    def _degrade(self, algorithm: str, projected: int) -> Search:
+        # the search starts over with more compact storage instead of running
+        # out of memory part way through
+        self.budget.degrade()
+        self.planner = None
+        self._reset_search()
+        self._send_image_reset_request()
+        self._send_degraded_message(projected)
+        return self._get_search(algorithm)
 
     def solve(self, state: ApplicationState) -> Optional[List[Point]]:
         self.clear_queue()
+        state = self._use_lattice(state)
         self._load_state(state)
-        queue = [[self.start_point]]
-        height, width, _ = self.image.pixels.shape
-        self.timer.start()
-        while queue:
-            path = queue.pop(0)
-            current_pixel = path[-1]
-            if current_pixel == self.end_point:
-                self._mark_solution(path)
-                self._send_visited_pixels(block=True)
-                self._send_solution()
-                self.clear_queue()
-                self._send_done_message()
-                return path
-            adjacent_pixels = self._get_adjacent_pixels(current_pixel)
-            for pixel in adjacent_pixels:
-                y, x = pixel
-                if (
-                    x < 0 or y < 0 or x >= width or y >= height
-                ) or self.image.bw_pixels[pixel] == 0:
-                    continue
-                if self.visited[pixel] != self.VISITED_VALUE:
-                    self.visited[pixel] = self.VISITED_VALUE
-                    new_path = list(path) + [pixel]
-                    queue.append(new_path)
-            self.timer.measure()
-            if self.timer.elapsed_time > self.frametime:
-                self.timer.start()
+        search = self._get_search(state.algorithm)
+        reachable = self._get_reachable(state)
+        self.scheduler.start()
+        # separate components are known not to connect without searching
+        if not self.image.reachable(state.start_point, state.end_point):
+            search.close()
+        while True:
+            try:
+                expanded = next(search)
+            except StopIteration as stop:
+                path: Optional[List[Point]] = stop.value
+                break
+            except BudgetExceeded as exceeded:
+                search = self._degrade(state.algorithm, exceeded.projected)
+                continue
+            if self.budget.exceeded(self.visit_sequence, reachable):
+                search.close()
+                projected = self.budget.projected(self.visit_sequence, reachable)
+                search = self._degrade(state.algorithm, projected)
+                continue
+            if self.scheduler.batch_done(expanded):
                 self._send_visited_pixels()
-                self._check_messages()
-                if self.reset:
-                    self.reset = False
-                    self._send_image_reset_request()
-                    self.response.set()
-                    return None
+            self._poll_control()
+            if self.reset:
+                self._cancel()
+                return None
+            self.scheduler.resume()
+        if path is not None:
+            return self._finish(path)
+        self._send_visited_pixels(block=True)
+        if self.record:
+            self._send_recording()
         self._send_done_message()
         return None
+
+
+class SolverPool(ProcessPoolSubscriber):
+    def __init__(self, name: str = "Maze", size: int = DEFAULT_SOLVERS) -> None:
+        super().__init__(
+            name,
+            Solver,
+            size,
+            done_topics=Solver.DONE_TOPICS,
+            win_topics=["MazeSolveDone"],
+        )
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 
+from mazesolver.config import DEFAULT_ALGORITHM, DEFAULT_MEMORY_BUDGET
 from mazesolver.image import MazeImage
 from mazesolver.types import Point
 
@@ -11,4 +12,12 @@ class ApplicationState:
     framerate: str = "15"
     start_point: Point = Point(0, 0)
     end_point: Point = Point(0, 0)
+    algorithm: str = DEFAULT_ALGORITHM
+    max_throughput: bool = False
+    prune: bool = False
+    portfolio: bool = False
+    lattice: bool = False
+    replan: bool = False
+    memory_budget: int = DEFAULT_MEMORY_BUDGET
+    record: bool = False
     working: bool = False
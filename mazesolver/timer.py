@@ -1,4 +1,5 @@
 import time
+from typing import Dict, Optional
 
 
 class Timer:
@@ -8,8 +9,109 @@ class Timer:
         self.elapsed_time: float = 0
 
     def start(self) -> None:
-        self._start_time = time.time()
+        self._start_time = time.perf_counter()
 
     def measure(self) -> None:
-        self._end_time = time.time()
+        self._end_time = time.perf_counter()
         self.elapsed_time = self._end_time - self._start_time
+
+
+class StartupReport:
+    def __init__(self) -> None:
+        self._start_time = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    def measure(self, step: str) -> None:
+        self.timings[step] = time.perf_counter() - self._start_time
+
+    def format(self) -> str:
+        lines = ["Startup timings (since launch):"]
+        for step, elapsed in self.timings.items():
+            lines.append(f"  {step:<16}{elapsed * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+class FrameScheduler:
+    MIN_BATCH = 16
+    MAX_BATCH = 1 << 20
+    BATCHES_PER_FRAME = 4
+    THROUGHPUT_BATCH_TIME = 0.05
+    SMOOTHING = 0.2
+
+    def __init__(self, frametime: Optional[float] = None) -> None:
+        self.frametime = frametime
+        self.batch_size = self.MIN_BATCH
+        self.rate: float = 0
+        self.frames = 0
+        self.overruns = 0
+        self.total_overrun: float = 0
+        self.max_overrun: float = 0
+        self._frame_start: float = 0
+        self._batch_start: float = 0
+
+    @property
+    def max_throughput(self) -> bool:
+        return not self.frametime
+
+    @property
+    def batch_time(self) -> float:
+        if self.frametime:
+            return self.frametime / self.BATCHES_PER_FRAME
+        return self.THROUGHPUT_BATCH_TIME
+
+    def start(self) -> None:
+        self.batch_size = self.MIN_BATCH
+        self.rate = 0
+        self.frames = self.overruns = 0
+        self.total_overrun = self.max_overrun = 0
+        self._frame_start = self._batch_start = time.perf_counter()
+
+    def resume(self) -> None:
+        # time spent outside the batches (sending frames, waiting while
+        # stopped) must not be billed to the expansion rate
+        self._batch_start = time.perf_counter()
+
+    def _tune(self, expansions: int, elapsed: float) -> None:
+        if elapsed <= 0:
+            self.batch_size = min(self.batch_size * 2, self.MAX_BATCH)
+            return
+        rate = expansions / elapsed
+        if self.rate:
+            rate = self.SMOOTHING * rate + (1 - self.SMOOTHING) * self.rate
+        self.rate = rate
+        batch_size = int(self.rate * self.batch_time)
+        self.batch_size = min(max(batch_size, self.MIN_BATCH), self.MAX_BATCH)
+
+    def batch_done(self, expansions: int) -> bool:
+        now = time.perf_counter()
+        self._tune(expansions, now - self._batch_start)
+        self._batch_start = now
+        frametime = self.frametime
+        if not frametime:
+            return False
+        elapsed = now - self._frame_start
+        if elapsed < frametime:
+            return False
+        overrun = elapsed - frametime
+        self.frames += 1
+        if overrun > self.batch_time:
+            self.overruns += 1
+        self.total_overrun += overrun
+        self.max_overrun = max(self.max_overrun, overrun)
+        self._frame_start = now
+        return True
+
+    def restart_frame(self) -> None:
+        self._frame_start = self._batch_start = time.perf_counter()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        mean_overrun = self.total_overrun / self.frames if self.frames else 0
+        return {
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "mean_overrun": mean_overrun,
+            "max_overrun": self.max_overrun,
+            "batch_size": self.batch_size,
+            "rate": self.rate,
+        }
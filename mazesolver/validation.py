@@ -77,7 +77,8 @@ class ResolutionValidator:
 
 
 class ImageValidator:
-    SAVE_FORMATS = ["PNG", "JPG", "JPEG"]
+    SAVE_FORMATS = ["PNG", "JPG", "JPEG", "JSON", "SVG"]
+    PATH_FORMATS = ["JSON", "SVG"]
 
     def __init__(self, state: ApplicationState) -> None:
         self.state = state
@@ -97,14 +98,33 @@ class ImageValidator:
             message=f"Invalid Save Format: must be one of {self.SAVE_FORMATS}",
         )
 
+    def show_no_solution_error(self) -> None:
+        messagebox.showerror(
+            title="Error", message="Invalid Operation: the maze must be solved first"
+        )
+
     def show_image_loading_error(self) -> None:
         messagebox.showerror(title="Error", message="Error: Invalid File")
 
+    def show_export_error(self, image_path: str) -> None:
+        messagebox.showerror(
+            title="Error", message=f"Error: could not export animation to {image_path}"
+        )
+
     def validate_image(self) -> None:
         if not self.image.loaded:
             self.show_image_not_loaded_error()
             raise ValueError("Image not loaded")
 
+    def validate_solution(self) -> None:
+        if self.image.solution_path is None:
+            self.show_no_solution_error()
+            raise ValueError("Maze not solved")
+
+    def is_path_format(self, image_path: str) -> bool:
+        save_format = os.path.splitext(image_path)[1].replace(".", "")
+        return save_format.upper() in self.PATH_FORMATS
+
     def validate_save_format(self, image_path: str) -> None:
         save_format = os.path.splitext(image_path)[1]
         save_format = save_format.replace(".", "")
@@ -131,3 +151,9 @@ class Validator:
 
     def validate_save_format(self, image_path: str) -> None:
         self.image_validator.validate_save_format(image_path)
+
+    def validate_solution(self) -> None:
+        self.image_validator.validate_solution()
+
+    def is_path_format(self, image_path: str) -> bool:
+        return self.image_validator.is_path_format(image_path)
@@ -0,0 +1,109 @@
+import math
+from typing import Any, Tuple
+
+import numpy as np
+
+from mazesolver.config import MAX_ZOOM
+from mazesolver.types import Point, RegionOfInterest, Size
+
+
+class Viewport:
+    def __init__(self, size: Size) -> None:
+        self.size = size
+        self.image_size = Size(1, 1)
+        # displayed pixels per image pixel
+        self.zoom = 1.0
+        # image coordinates of the top left corner of the view
+        self.left = 0.0
+        self.top = 0.0
+
+    @property
+    def min_zoom(self) -> float:
+        return min(
+            self.size.width / self.image_size.width,
+            self.size.height / self.image_size.height,
+        )
+
+    @property
+    def level(self) -> int:
+        # the finest pyramid level that is still downscaled when displayed
+        return max(int(math.floor(-math.log2(self.zoom))), 0)
+
+    def fit(self, image_size: Size, size: Size) -> None:
+        self.image_size = image_size
+        self.size = size
+        self.zoom = self.min_zoom
+        self._clamp()
+
+    def _clamp_axis(self, start: float, visible: float, length: int) -> float:
+        if visible >= length:
+            return (length - visible) / 2
+        return min(max(start, 0.0), length - visible)
+
+    def _clamp(self) -> None:
+        width, height = self.image_size
+        self.left = self._clamp_axis(self.left, self.size.width / self.zoom, width)
+        self.top = self._clamp_axis(self.top, self.size.height / self.zoom, height)
+
+    def zoom_at(self, factor: float, x: int, y: int) -> bool:
+        zoom = min(max(self.zoom * factor, self.min_zoom), MAX_ZOOM)
+        if zoom == self.zoom:
+            return False
+        # the image pixel under the cursor stays under the cursor
+        self.left += x / self.zoom - x / zoom
+        self.top += y / self.zoom - y / zoom
+        self.zoom = zoom
+        self._clamp()
+        return True
+
+    def pan(self, dx: int, dy: int) -> None:
+        self.left -= dx / self.zoom
+        self.top -= dy / self.zoom
+        self._clamp()
+
+    def to_image(self, x: int, y: int) -> Point:
+        # the image pixel under the center of the view pixel, as rendered
+        return Point(
+            int(math.floor(self.left + (x + 0.5) / self.zoom)),
+            int(math.floor(self.top + (y + 0.5) / self.zoom)),
+        )
+
+    def visible_area(self) -> RegionOfInterest:
+        width, height = self.image_size
+        right = self.left + self.size.width / self.zoom
+        bottom = self.top + self.size.height / self.zoom
+        return RegionOfInterest(
+            max(int(math.floor(self.left)), 0),
+            max(int(math.floor(self.top)), 0),
+            min(int(math.ceil(right)), width),
+            min(int(math.ceil(bottom)), height),
+        )
+
+    def contains(self, region: Any) -> bool:
+        rows, columns = (np.asarray(axis) for axis in region)
+        area = self.visible_area()
+        inside = (columns >= area.x1) & (columns < area.x2)
+        inside &= (rows >= area.y1) & (rows < area.y2)
+        return bool(np.any(inside))
+
+    def window(
+        self, level: int, shape: Tuple[int, int]
+    ) -> Tuple[slice, slice, np.ndarray]:
+        # the part of a pyramid level under the view, with the affine map
+        # from view pixels to that part, one pixel of margin keeps the
+        # interpolation at the edges inside the crop
+        scale = 2**level
+        height, width = shape
+        area = self.visible_area()
+        x1 = min(max(area.x1 // scale - 1, 0), width - 1)
+        y1 = min(max(area.y1 // scale - 1, 0), height - 1)
+        x2 = min(-(-area.x2 // scale) + 1, width)
+        y2 = min(-(-area.y2 // scale) + 1, height)
+        step = 1 / (self.zoom * scale)
+        transform = np.array(
+            [
+                [step, 0, (self.left + 0.5 / self.zoom) / scale - 0.5 - x1],
+                [0, step, (self.top + 0.5 / self.zoom) / scale - 0.5 - y1],
+            ]
+        )
+        return slice(y1, max(y2, y1 + 1)), slice(x1, max(x2, x1 + 1)), transform
@@ -0,0 +1,70 @@
+from queue import Queue
+
+import numpy as np
+import pytest
+
+from mazesolver.image import MazeImage
+from mazesolver.parallel import ParallelSolver
+from mazesolver.solver import Solver
+from mazesolver.state import ApplicationState
+from mazesolver.types import Point
+
+
+class LocalSolver(Solver):
+    def __init__(self) -> None:
+        super().__init__()
+        self.output_queue = Queue()
+
+    def clear_queue(self) -> None:
+        pass
+
+
+def make_maze(size: int, seed: int) -> MazeImage:
+    # a maze carved by a random depth first walk over a grid of cells
+    rng = np.random.default_rng(seed)
+    cells = size // 2
+    bw = np.zeros((cells * 2 + 1, cells * 2 + 1), dtype=np.uint8)
+    seen = np.zeros((cells, cells), dtype=bool)
+    stack = [(0, 0)]
+    seen[0, 0] = True
+    bw[1, 1] = 255
+    while stack:
+        y, x = stack[-1]
+        steps = [
+            (y + dy, x + dx)
+            for dy, dx in ((0, 1), (1, 0), (0, -1), (-1, 0))
+            if 0 <= y + dy < cells and 0 <= x + dx < cells and not seen[y + dy, x + dx]
+        ]
+        if not steps:
+            stack.pop()
+            continue
+        ny, nx = steps[rng.integers(len(steps))]
+        seen[ny, nx] = True
+        bw[ny * 2 + 1, nx * 2 + 1] = 255
+        bw[y + ny + 1, x + nx + 1] = 255
+        stack.append((ny, nx))
+    # a few extra openings so there is more than one route
+    for y, x in rng.integers(1, cells * 2, size=(cells, 2)):
+        bw[y, x] = 255
+    image = MazeImage()
+    image.set_pixels(np.dstack([bw] * 3), bw)
+    return image
+
+
+@pytest.mark.parametrize("workers", [1, 3, 4])
+def test_parallel_length_matches_solver(workers: int) -> None:
+    image = make_maze(80, workers)
+    height, width = image.shape
+    state = ApplicationState(
+        image,
+        algorithm="BFS",
+        max_throughput=True,
+        start_point=Point(1, 1),
+        end_point=Point(width - 2, height - 2),
+    )
+    expected = LocalSolver().solve(state)
+    path = ParallelSolver(workers).solve(state)
+    assert expected is not None and path is not None
+    assert len(path) == len(expected)
+    assert path[0] == (1, 1) and path[-1] == (height - 2, width - 2)
+    assert all(image.pixels[y, x, 0] for y, x in path)